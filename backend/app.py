@@ -1,54 +1,216 @@
+import os
+import json
+import math
 import time
-from flask import Flask, jsonify, request
+import threading
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-from models.asr_model import transcribe_audio_sequential , transcribe_audio_parallel, get_available_asr_models
-from models.summarizer_model import summarize_text
+from models.asr_model import transcribe_audio_sequential , transcribe_audio_streaming, iter_transcribe_stream, get_available_asr_models, check_worker_pool, warm_worker_pool, get_asr_pipeline, resolve_asr_model, transcribe_within_budget, plan_memory, reserve_transcription, transcribe_audio_draft, score_segments, refine_segments, segments_text, model_size_mb, MODEL_ID as ASR_MODEL_ID, DRAFT_MODEL_ID as DRAFT_ASR_MODEL_ID, REFINE_MODEL_ID as REFINE_ASR_MODEL_ID
+from models.summarizer_model import summarize_text, is_summary_error, get_summarizer, get_available_summarizers, reserve_summary, MODEL_ID as SUMMARIZER_MODEL_ID
+from models.pipeline import iter_transcribe_and_summarize
+from models.model_registry import model_status, loaded_size_mb, MODEL_MEMORY_BUDGET_MB
 from utils.supabase_clients import supabase
+from utils.job_queue import JobQueue, QueueFull, JOB_WORKERS
+from utils.metrics import render as render_metrics, register_collector, trace_request
+from utils.storage_ingest import list_audio_files, ingest_files, INGEST_MAX_FILES
+from utils.admission import ConcurrencyLimiter, Overloaded, parse_route_limits
+from utils.extractive import EXTRACTIVE_METHODS
+from utils import memory_governor
+from utils.memory_governor import MemoryBudgetExceeded, source_size, audio_seconds
 
 app = Flask(__name__)
 CORS(app)
 
+# Transcriptions and refinements may use all but one job worker so summaries
+# never starve; a bulk ingestion already runs several files at once, so only
+# one at a time
+job_queue = JobQueue(type_limits={
+    'transcribe': max(1, JOB_WORKERS - 1),
+    'refine': max(1, JOB_WORKERS - 1),
+    'supabase_batch': 1
+})
+
+# Requests each route runs at once and lets wait, as "endpoint=running:waiting,...";
+# routes not listed are not limited
+ROUTE_LIMITS = os.getenv(
+    "ROUTE_LIMITS",
+    "transcribe=4:16,transcribe_stream=4:16,transcribe_draft=4:16,transcribe_summarize=2:8,summarize=2:8,"
+    "process_supabase_file=2:8,warmup=1:0"
+)
+# Seconds a request may wait for a slot before it is turned away with a 503
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+route_limiters = {
+    endpoint: ConcurrencyLimiter(endpoint, running, waiting, ADMISSION_MAX_WAIT)
+    for endpoint, (running, waiting) in parse_route_limits(ROUTE_LIMITS).items()
+}
+
 def format_duration(seconds):
     minutes = int(seconds // 60)
     seconds = int(seconds % 60)
     return f"{minutes:02d}:{seconds:02d}"
 
 
-@app.route('/transcribe', methods=['POST', 'OPTIONS'])
-def transcribe():
-    if request.method == 'OPTIONS':
-        return '', 200
+def int_param(value, name, default=None, minimum=None):
+    """Parse an optional integer request field; bad values raise ValueError with a message for the client"""
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+
+def float_param(value, name, default=None, minimum=None):
+    """Parse an optional number request field; bad values raise ValueError with a message for the client"""
+    if value is None or value == '':
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return number
+
+
+def wants_trace(data=None):
+    """True when the request asks for a per-stage trace (?trace=true, form or JSON field)."""
+    value = request.args.get('trace') or request.form.get('trace') or (data or {}).get('trace')
+    return str(value).lower() == 'true'
+
+
+@app.before_request
+def admit_request():
+    """Hold the request until its route has a free slot, or reject it with 429/503 and Retry-After"""
+    limiter = route_limiters.get(request.endpoint)
+    if limiter is None or request.method == 'OPTIONS':
+        return None
+    try:
+        limiter.acquire()
+    except Overloaded as e:
+        return jsonify({'error': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+    g.admitted = (limiter, time.time())
+
+
+def release_admission(admitted):
+    limiter, start_time = admitted
+    limiter.release(time.time() - start_time)
+
+
+@app.after_request
+def hold_admission_until_sent(response):
+    # Released once the server has sent the whole body, so streamed responses keep their slot
+    admitted = g.pop('admitted', None)
+    if admitted:
+        response.call_on_close(lambda: release_admission(admitted))
+    return response
+
+
+@app.teardown_request
+def release_request(exc=None):
+    # Requests that never produced a response
+    admitted = g.pop('admitted', None)
+    if admitted:
+        release_admission(admitted)
 
+
+def memory_error(e):
+    """503 with Retry-After while memory is short, 413 when the request could never fit"""
+    if e.retryable:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
+    return jsonify({'error': str(e)}), 413
+
+
+def public_segment(segment):
+    """A draft or refined segment without its sample offsets"""
+    return {key: value for key, value in segment.items() if key not in ('offset', 'length')}
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+SEGMENTATIONS = ('vad', 'fixed')
+
+
+def get_uploaded_audio():
+    """Return (audio_file, None) for a valid upload, or (None, error response)"""
     if 'audio' not in request.files:
-        return jsonify({'error': 'No audio file provided'}), 400
+        return None, (jsonify({'error': 'No audio file provided'}), 400)
     audio_file = request.files['audio']
 
     if audio_file.filename == '':
-        return jsonify({'error': 'No audio file selected'}), 400
+        return None, (jsonify({'error': 'No audio file selected'}), 400)
     allowed_extensions = {'wav', 'mp3', 'mpeg', 'm4a', 'webm'}
     
     if '.' not in audio_file.filename or audio_file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
-        return jsonify({'error': 'Invalid file type. Please upload WAV, MP3, M4A, or WebM files.'}), 400
+        return None, (jsonify({'error': 'Invalid file type. Please upload WAV, MP3, M4A, or WebM files.'}), 400)
+    return audio_file, None
+
+
+@app.route('/transcribe', methods=['POST', 'OPTIONS'])
+def transcribe():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    audio_file, error = get_uploaded_audio()
+    if error:
+        return error
     
     # Get optional parameters for parallel processing
     use_parallel = request.form.get('use_parallel', 'true').lower() == 'true'
-    num_processes = int(request.form.get('num_processes', 2))
-    segment_length = int(request.form.get('segment_length', 30))
+    use_streaming = request.form.get('use_streaming', 'false').lower() == 'true'
+    segmentation = request.form.get('segmentation', 'vad').lower()
+    if segmentation not in SEGMENTATIONS:
+        return jsonify({'error': "segmentation must be 'vad' or 'fixed'"}), 400
+    try:
+        # Omitted values are planned from the audio and current load; given ones are clamped
+        num_processes = int_param(request.form.get('num_processes'), 'num_processes', minimum=1)
+        segment_length = int_param(request.form.get('segment_length'), 'segment_length', minimum=1)
+        # Seconds shared by neighbouring fixed segments; defaults to ASR_SEGMENT_OVERLAP
+        overlap = float_param(request.form.get('overlap'), 'overlap', minimum=0)
+        model_id = resolve_asr_model(request.form.get('model'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
         start_time = time.time()
         print(f"Starting transcription at {time.strftime('%H:%M:%S')}")
+        plan = {}
         
-        if use_parallel:
-            print(f"Using parallel processing with {num_processes} processes, {segment_length}s segments")
-            transcribed_text = transcribe_audio_parallel(
-                audio_file, 
-                num_processes=num_processes, 
-                segment_length=segment_length
-            )
-        else:
-            print("Using sequential processing")
-            transcribed_text = transcribe_audio_sequential(audio_file)
+        # The memory governor may switch to streaming, fewer workers or a smaller model
+        with trace_request(wants_trace()) as trace:
+            if use_streaming or use_parallel:
+                print("Using streaming decode" if use_streaming else f"Using parallel processing with {segmentation} segments")
+                transcribed_text = transcribe_within_budget(
+                    audio_file,
+                    streaming=use_streaming,
+                    num_processes=num_processes,
+                    segment_length=segment_length,
+                    segmentation=segmentation,
+                    model_id=model_id,
+                    stats=plan,
+                    overlap=overlap
+                )
+                use_streaming = plan['streaming']
+                model_id = plan['model']
+            else:
+                print("Using sequential processing")
+                with reserve_transcription(source_size(audio_file), model_id, seconds=audio_seconds(audio_file)) as fit:
+                    plan['downgrades'] = fit['downgrades']
+                    model_id = fit['model_id']
+                    if fit['streaming']:
+                        use_streaming = True
+                        transcribed_text = transcribe_audio_streaming(
+                            audio_file, fit['num_processes'], model_id=model_id, stats=plan
+                        )
+                    else:
+                        transcribed_text = transcribe_audio_sequential(audio_file, model_id=model_id)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -58,19 +220,307 @@ def transcribe():
         if not transcribed_text:
             return jsonify({'error': 'Transcription failed - no text was generated'}), 400 
         
-        return jsonify({
+        if use_streaming:
+            processing_method = 'streaming'
+        else:
+            processing_method = 'parallel' if use_parallel else 'sequential'
+        chunked = use_streaming or use_parallel
+
+        result = {
             'transcription': transcribed_text,
             'processing_time': duration_formatted,
             'processing_time_seconds': round(duration, 2),
-            'processing_method': 'parallel' if use_parallel else 'sequential',
-            'num_processes': num_processes if use_parallel else 1,
-            'segment_length': segment_length if use_parallel else None
-        })
+            'processing_method': processing_method,
+            'num_processes': plan.get('num_processes', 1) if chunked else 1,
+            'segment_length': plan.get('segment_length') if chunked else None,
+            'parameters_clamped': plan.get('clamped', False),
+            'segmentation': segmentation if use_parallel and not use_streaming else None,
+            'overlap': plan.get('overlap'),
+            'failed_segments': plan.get('failed_segments', 0),
+            'downgrades': plan.get('downgrades', []),
+            'model': model_id
+        }
+        if trace:
+            result['trace'] = trace
+        return jsonify(result)
+    except MemoryBudgetExceeded as e:
+        print(f"Transcription rejected: {str(e)}")
+        return memory_error(e)
     except Exception as e:
         print(f"Transcription error: {str(e)}")
         return jsonify({'error': f'Transcription error: {str(e)}'}), 500
 
 
+@app.route('/transcribe_stream', methods=['POST', 'OPTIONS'])
+def transcribe_stream():
+    """Server-Sent Events variant of /transcribe.
+
+    Emits a 'segment' event (index, start, end, text) as each segment finishes,
+    then a 'done' event with the full transcription, or an 'error' event.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    audio_file, error = get_uploaded_audio()
+    if error:
+        return error
+
+    try:
+        # Omitted values are planned from the audio and current load; given ones are clamped
+        num_processes = int_param(request.form.get('num_processes'), 'num_processes', minimum=1)
+        segment_length = int_param(request.form.get('segment_length'), 'segment_length', minimum=1)
+        model_id = resolve_asr_model(request.form.get('model'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # The upload is closed once this view returns, so keep the compressed
+    # bytes; decoding still happens incrementally inside the generator
+    audio_bytes = audio_file.read()
+    try:
+        fit = plan_memory(len(audio_bytes), model_id, streaming=True, num_processes=num_processes)
+    except MemoryBudgetExceeded as e:
+        return memory_error(e)
+    model_id = fit['model_id']
+
+    def generate():
+        start_time = time.time()
+        print(f"Starting streamed transcription at {time.strftime('%H:%M:%S')}")
+        segments = []
+        plan = {}
+        try:
+            with memory_governor.reserve(fit['reserve_mb'], 'transcription'):
+                for segment in iter_transcribe_stream(audio_bytes, fit['num_processes'], segment_length, model_id, plan):
+                    segments.append(segment)
+                    yield sse_event('segment', segment)
+
+            segments.sort(key=lambda s: s['index'])
+            transcribed_text = " ".join(s['text'] for s in segments if s['text'].strip())
+            duration = time.time() - start_time
+            print(f"Streamed transcription completed in {format_duration(duration)} (MM:SS)")
+
+            if not transcribed_text:
+                yield sse_event('error', {'error': 'Transcription failed - no text was generated'})
+                return
+
+            yield sse_event('done', {
+                'transcription': transcribed_text,
+                'num_segments': len(segments),
+                'processing_time': format_duration(duration),
+                'processing_time_seconds': round(duration, 2),
+                'processing_method': 'streaming',
+                'num_processes': plan.get('num_processes'),
+                'segment_length': plan.get('segment_length'),
+                'parameters_clamped': plan.get('clamped', False),
+                'downgrades': fit['downgrades'],
+                'model': model_id
+            })
+        except Exception as e:
+            print(f"Transcription error: {str(e)}")
+            yield sse_event('error', {'error': f'Transcription error: {str(e)}'})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/transcribe_draft', methods=['POST', 'OPTIONS'])
+def transcribe_draft():
+    """Two-tier transcription: a fast draft now, refined text by polling.
+
+    The upload is transcribed with the draft model (whisper-tiny by default)
+    and returned segment by segment as soon as it is. A background job then
+    scores each draft and re-transcribes the ones the draft model was unsure
+    of with the larger refine_model; poll status_url for their refined text
+    as it lands and for the scored, refined segments once the job
+    completes. Form fields: audio, model, refine_model,
+    num_processes, segment_length and priority.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    audio_file, error = get_uploaded_audio()
+    if error:
+        return error
+
+    try:
+        num_processes = int_param(request.form.get('num_processes'), 'num_processes', minimum=1)
+        segment_length = int_param(request.form.get('segment_length'), 'segment_length', minimum=1)
+        model_id = resolve_asr_model(request.form.get('model') or DRAFT_ASR_MODEL_ID)
+        refine_model = resolve_asr_model(request.form.get('refine_model') or REFINE_ASR_MODEL_ID)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if model_size_mb(refine_model) <= model_size_mb(model_id):
+        return jsonify({'error': 'refine_model must be larger than the draft model'}), 400
+    try:
+        priority = int_param(request.form.get('priority'), 'priority', 5)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Also the refinement job's input
+    audio_bytes = audio_file.read()
+
+    try:
+        start_time = time.time()
+        print(f"Starting draft transcription at {time.strftime('%H:%M:%S')}")
+        plan = {}
+        with trace_request(wants_trace()) as trace:
+            with reserve_transcription(len(audio_bytes), model_id, num_processes=num_processes,
+                                       seconds=audio_seconds(audio_bytes)) as fit:
+                if fit['streaming']:
+                    # VAD segmentation needs the whole file decoded
+                    return jsonify({'error': 'Audio is too long to draft within the memory budget; use /transcribe_stream'}), 413
+                model_id = fit['model_id']
+                segments = transcribe_audio_draft(audio_bytes, fit['num_processes'], segment_length, model_id, plan)
+
+        duration = time.time() - start_time
+        print(f"Draft transcription completed in {format_duration(duration)} (MM:SS)")
+        transcribed_text = segments_text(segments)
+        if not transcribed_text:
+            return jsonify({'error': 'Transcription failed - no text was generated'}), 400
+
+        # Known before scoring: failed, empty and repeating drafts
+        to_refine = [s for s in segments if s['refine']]
+        job_id = None
+        refine_error = None
+        try:
+            job_id = job_queue.submit(
+                'refine',
+                {'model': refine_model, 'draft_model': model_id, 'num_processes': num_processes, 'segments': segments},
+                payload=audio_bytes,
+                priority=priority
+            )
+        except QueueFull as e:
+            # The draft is still worth returning
+            refine_error = f'Job queue is full: {str(e)}'
+
+        result = {
+            'transcription': transcribed_text,
+            'segments': [public_segment(s) for s in segments],
+            'segments_to_refine': len(to_refine),
+            'refine_job_id': job_id,
+            'status_url': f'/jobs/{job_id}' if job_id else None,
+            'refine_error': refine_error,
+            'processing_time': format_duration(duration),
+            'processing_time_seconds': round(duration, 2),
+            'processing_method': 'draft',
+            'num_processes': plan.get('num_processes'),
+            'segment_length': plan.get('segment_length'),
+            'parameters_clamped': plan.get('clamped', False),
+            'failed_segments': plan.get('failed_segments', 0),
+            'downgrades': fit['downgrades'],
+            'model': model_id,
+            'refine_model': refine_model
+        }
+        if trace:
+            result['trace'] = trace
+        return jsonify(result)
+    except MemoryBudgetExceeded as e:
+        print(f"Draft transcription rejected: {str(e)}")
+        return memory_error(e)
+    except Exception as e:
+        print(f"Transcription error: {str(e)}")
+        return jsonify({'error': f'Transcription error: {str(e)}'}), 500
+
+
+@app.route('/transcribe_summarize', methods=['POST', 'OPTIONS'])
+def transcribe_summarize():
+    """Transcribe an upload and summarize it in one request.
+
+    Summaries of early transcript chunks are generated while later audio is
+    still being transcribed; only the final reduce waits for the end. Form
+    fields: audio, model, num_processes, segment_length, max_length,
+    min_length and stream. With stream=true the response is Server-Sent
+    Events: 'segment' and 'chunk_summary' as they finish, then 'done' or
+    'error'. Otherwise one JSON object is returned once the summary is ready.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    audio_file, error = get_uploaded_audio()
+    if error:
+        return error
+
+    use_streaming = request.form.get('stream', 'false').lower() == 'true'
+    try:
+        num_processes = int_param(request.form.get('num_processes'), 'num_processes', minimum=1)
+        segment_length = int_param(request.form.get('segment_length'), 'segment_length', minimum=1)
+        max_length = int_param(request.form.get('max_length'), 'max_length', 130, minimum=1)
+        min_length = int_param(request.form.get('min_length'), 'min_length', 30, minimum=0)
+        if min_length > max_length:
+            raise ValueError('min_length must not be greater than max_length')
+        model_id = resolve_asr_model(request.form.get('model'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Read now: the upload is closed once this view returns
+    audio_bytes = audio_file.read()
+    trace_enabled = wants_trace()
+    try:
+        fit = plan_memory(len(audio_bytes), model_id, streaming=True, num_processes=num_processes)
+    except MemoryBudgetExceeded as e:
+        return memory_error(e)
+    model_id = fit['model_id']
+
+    def run():
+        """Yield the pipeline's events, then the final result or an error as ('done' | 'error', data)"""
+        start_time = time.time()
+        print(f"Starting transcribe and summarize at {time.strftime('%H:%M:%S')}")
+        stats = {}
+        try:
+            with trace_request(trace_enabled) as trace, memory_governor.reserve(fit['reserve_mb'], 'transcription'):
+                for event, data in iter_transcribe_and_summarize(
+                    audio_bytes, max_length, min_length, fit['num_processes'], segment_length, model_id, stats
+                ):
+                    if event != 'done':
+                        yield event, data
+                        continue
+                    result = data
+        except Exception as e:
+            print(f"Pipeline error: {str(e)}")
+            yield 'error', {'error': f'Pipeline error: {str(e)}'}
+            return
+
+        duration = time.time() - start_time
+        print(f"Transcribe and summarize completed in {format_duration(duration)} (MM:SS)")
+        if not result['transcription']:
+            yield 'error', {'error': 'Transcription failed - no text was generated'}
+            return
+        if not result['summary']:
+            yield 'error', {'error': 'Summarization failed - no summary was generated',
+                            'transcription': result['transcription']}
+            return
+
+        result.update({
+            'processing_time': format_duration(duration),
+            'processing_time_seconds': round(duration, 2),
+            'transcription_seconds': stats.get('transcription_seconds'),
+            # Time spent after the last segment: pending map summaries plus the reduce
+            'summary_wait_seconds': round(duration - stats.get('transcription_seconds', 0), 2),
+            'chunks_summarized_during_transcription': stats.get('chunks_summarized_during_transcription'),
+            'reduce_depth': stats.get('depth'),
+            'num_processes': stats.get('num_processes'),
+            'segment_length': stats.get('segment_length'),
+            'failed_segments': stats.get('failed_segments', 0),
+            'downgrades': fit['downgrades'],
+            'model': model_id
+        })
+        if trace:
+            result['trace'] = trace
+        yield 'done', result
+
+    if use_streaming:
+        return Response(
+            stream_with_context(sse_event(event, data) for event, data in run()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    for event, data in run():
+        if event == 'done':
+            return jsonify(data)
+        if event == 'error':
+            return jsonify(data), 500 if data['error'].startswith('Pipeline error') else 400
+
+
 @app.route('/summarize', methods=['POST'])
 def summarize():
     data = request.get_json()
@@ -82,12 +532,27 @@ def summarize():
     # Get optional parameters with defaults
     max_length = data.get('max_length', 130)
     min_length = data.get('min_length', 30)
+    try:
+        batch_size = int_param(data.get('batch_size'), 'batch_size', minimum=1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Optional extractive pre-filter: 'tfidf' or 'textrank', keeping about
+    # extractive_tokens tokens (default: one model pass) of salient sentences
+    extractive = data.get('extractive') or None
+    if extractive is not None and extractive not in EXTRACTIVE_METHODS:
+        return jsonify({'error': f"extractive must be one of: {', '.join(EXTRACTIVE_METHODS)}"}), 400
+    try:
+        extractive_tokens = int_param(data.get('extractive_tokens'), 'extractive_tokens', minimum=1)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
         start_time = time.time()
         print(f"Starting summarization at {time.strftime('%H:%M:%S')}")
         
-        summary = summarize_text(text, max_length, min_length)
+        stats = {}
+        with trace_request(wants_trace(data)) as trace, reserve_summary(text):
+            summary = summarize_text(text, max_length, min_length, stats, batch_size, extractive, extractive_tokens)
         
         end_time = time.time()
         duration = end_time - start_time
@@ -95,35 +560,322 @@ def summarize():
         print(f"Summarization completed in {duration_formatted} (MM:SS)")
         
         # added this to check if summary failed
-        if not summary or summary.startswith("Failed to") or summary.startswith("GPU/") or summary.startswith("Insufficient") or summary.startswith("Token limit") or summary.startswith("Summarization model") or summary.startswith("Unexpected error"):
+        if is_summary_error(summary):
             return jsonify({'error': summary or 'Summarization failed - no summary was generated'}), 400
         
-        return jsonify({
+        result = {
             'summary': summary,
             'processing_time': duration_formatted,
             'processing_time_seconds': round(duration, 2),
             'original_length': len(text),
-            'summary_length': len(summary)
-        })
+            'summary_length': len(summary),
+            'reduce_depth': stats.get('depth'),
+            'levels': stats.get('levels', []),
+            'throughput_tokens_per_second': (stats['levels'][0].get('tokens_per_second') if stats.get('levels') else None),
+            'cached': stats.get('cached', False),
+            'extractive': stats.get('extractive')
+        }
+        if trace:
+            result['trace'] = trace
+        return jsonify(result)
         
+    except MemoryBudgetExceeded as e:
+        print(f"Summarization rejected: {str(e)}")
+        return memory_error(e)
     except Exception as e:
         print(f"Summarization error: {str(e)}")
         return jsonify({'error': f'Summarization error: {str(e)}'}), 500
 
 
+def run_transcription_job(params, input_path, report_progress):
+    start_time = time.time()
+    transcribed_text = transcribe_within_budget(
+        input_path,
+        num_processes=params.get('num_processes'),
+        segment_length=params.get('segment_length'),
+        segmentation=params.get('segmentation', 'vad'),
+        progress=report_progress,
+        model_id=params.get('model', ASR_MODEL_ID),
+        overlap=params.get('overlap')
+    )
+    if not transcribed_text:
+        raise RuntimeError('Transcription failed - no text was generated')
+    duration = time.time() - start_time
+    return {
+        'transcription': transcribed_text,
+        'processing_time': format_duration(duration),
+        'processing_time_seconds': round(duration, 2)
+    }
+
+
+def run_refinement_job(params, input_path, report_progress):
+    """Score the segments of a /transcribe_draft result and refine the unsure ones; progress detail lists refined text as it lands"""
+    start_time = time.time()
+    with reserve_transcription(source_size(input_path), params['model'], num_processes=params.get('num_processes'),
+                               seconds=audio_seconds(input_path)) as fit:
+        if model_size_mb(fit['model_id']) <= model_size_mb(params['draft_model']):
+            raise RuntimeError(f"Not enough memory to refine with {params['model']}")
+        segments = score_segments(input_path, params['segments'], params['draft_model'])
+        segments = refine_segments(
+            input_path,
+            segments,
+            fit['model_id'],
+            fit['num_processes'],
+            progress=lambda done, total, refined: report_progress(done, total, {'refined': refined})
+        )
+    duration = time.time() - start_time
+    return {
+        'transcription': segments_text(segments),
+        'segments': [public_segment(s) for s in segments],
+        'refined_segments': sum(1 for s in segments if s['refined']),
+        'processing_time': format_duration(duration),
+        'processing_time_seconds': round(duration, 2),
+        'downgrades': fit['downgrades'],
+        'model': fit['model_id']
+    }
+
+
+def run_summarization_job(params, input_path, report_progress):
+    start_time = time.time()
+    with reserve_summary(params['text']):
+        summary = summarize_text(
+            params['text'],
+            params.get('max_length', 130),
+            params.get('min_length', 30),
+            extractive=params.get('extractive'),
+            extractive_tokens=params.get('extractive_tokens')
+        )
+    if is_summary_error(summary):
+        raise RuntimeError(summary or 'Summarization failed - no summary was generated')
+    duration = time.time() - start_time
+    return {
+        'summary': summary,
+        'processing_time': format_duration(duration),
+        'processing_time_seconds': round(duration, 2),
+        'original_length': len(params['text']),
+        'summary_length': len(summary)
+    }
+
+
+def run_supabase_batch_job(params, input_path, report_progress):
+    if not supabase:
+        raise RuntimeError('Supabase is not configured')
+    start_time = time.time()
+    # One bucket client for the whole batch, so downloads reuse its connections
+    bucket = supabase.storage.from_(params['bucket'])
+    paths = params.get('files') or list_audio_files(bucket, params.get('prefix', ''))
+    print(f"Ingesting {len(paths)} files from {params['bucket']}")
+    report_progress(0, len(paths))
+
+    model_id = params.get('model', ASR_MODEL_ID)
+    streaming = bool(params.get('streaming'))
+    transcribe = lambda audio: transcribe_within_budget(audio, streaming=streaming, segmentation='vad', model_id=model_id)
+    files = ingest_files(bucket, paths, transcribe, progress=report_progress)
+
+    duration = time.time() - start_time
+    completed = sum(1 for info in files.values() if info['status'] == 'completed')
+    print(f"Ingested {completed}/{len(paths)} files in {format_duration(duration)} (MM:SS)")
+    return {
+        'bucket': params['bucket'],
+        'total': len(paths),
+        'completed': completed,
+        'failed': len(paths) - completed,
+        # Failed only for lack of memory; worth submitting again
+        'retryable': [path for path, info in files.items() if info.get('retryable')],
+        'files': files,
+        'processing_time': format_duration(duration),
+        'processing_time_seconds': round(duration, 2)
+    }
+
+
+job_queue.register('transcribe', run_transcription_job)
+job_queue.register('refine', run_refinement_job)
+job_queue.register('summarize', run_summarization_job)
+job_queue.register('supabase_batch', run_supabase_batch_job)
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a transcription (multipart with 'audio') or summarization (JSON with 'text') job"""
+    try:
+        if 'audio' in request.files:
+            audio_file, error = get_uploaded_audio()
+            if error:
+                return error
+            params = {
+                'num_processes': int_param(request.form.get('num_processes'), 'num_processes', minimum=1),
+                'segment_length': int_param(request.form.get('segment_length'), 'segment_length', minimum=1),
+                'segmentation': request.form.get('segmentation', 'vad').lower(),
+                'overlap': float_param(request.form.get('overlap'), 'overlap', minimum=0),
+                'model': resolve_asr_model(request.form.get('model'))
+            }
+            if params['segmentation'] not in SEGMENTATIONS:
+                raise ValueError("segmentation must be 'vad' or 'fixed'")
+            job_id = job_queue.submit(
+                'transcribe',
+                params,
+                payload=audio_file.read(),
+                priority=int_param(request.form.get('priority'), 'priority', 10)
+            )
+        else:
+            data = request.get_json(silent=True)
+            if not data or 'text' not in data:
+                return jsonify({'error': 'Provide an audio file or JSON with text to summarize'}), 400
+            params = {
+                'text': data['text'],
+                'max_length': data.get('max_length', 130),
+                'min_length': data.get('min_length', 30),
+                'extractive': data.get('extractive') or None,
+                'extractive_tokens': int_param(data.get('extractive_tokens'), 'extractive_tokens', minimum=1)
+            }
+            if params['extractive'] is not None and params['extractive'] not in EXTRACTIVE_METHODS:
+                raise ValueError(f"extractive must be one of: {', '.join(EXTRACTIVE_METHODS)}")
+            job_id = job_queue.submit('summarize', params, priority=int_param(data.get('priority'), 'priority', 0))
+    except QueueFull as e:
+        return jsonify({'error': f'Job queue is full: {str(e)}'}), 503, {'Retry-After': '30'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Failed to create job: {str(e)}'}), 500
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
 @app.route('/summarizers', methods=['GET'])
 def get_summarizers():
     """Get available summarizer models"""
     try:
-        models =  get_available_asr_models()
+        models = get_available_summarizers()
         return jsonify({
             'available_models': models,
-            'current_model': 'facebook/bart-large-cnn'
+            'current_model': SUMMARIZER_MODEL_ID,
+            'models': model_status(models)
         })
     except Exception as e:
         return jsonify({'error': f'Failed to get summarizers: {str(e)}'}), 500
 
 
+@app.route('/asr_models', methods=['GET'])
+def get_asr_models():
+    """Get selectable ASR models with load state and latency stats.
+
+    Load state and memory are for the API process; pool workers keep their
+    own copies within the same budget.
+    """
+    try:
+        models = get_available_asr_models()
+        return jsonify({
+            'available_models': models,
+            'default_model': ASR_MODEL_ID,
+            'draft_model': DRAFT_ASR_MODEL_ID,
+            'refine_model': REFINE_ASR_MODEL_ID,
+            'models': model_status(models),
+            'memory_budget_mb': MODEL_MEMORY_BUDGET_MB,
+            'loaded_mb': loaded_size_mb()
+        })
+    except Exception as e:
+        return jsonify({'error': f'Failed to get ASR models: {str(e)}'}), 500
+
+
+@app.route('/asr_pool/health', methods=['GET'])
+def asr_pool_health():
+    """Ping every ASR worker; unhealthy pools are restarted"""
+    try:
+        status = check_worker_pool()
+        return jsonify(status), 200 if status['healthy'] else 503
+    except Exception as e:
+        return jsonify({'error': f'Health check failed: {str(e)}'}), 500
+
+
+@app.route('/warmup', methods=['POST'])
+def warmup():
+    """Load models now instead of on first use.
+
+    Optional JSON body: {"models": ["asr", "summarizer", "asr_pool"]} (default all)
+    """
+    loaders = {
+        'asr': get_asr_pipeline,
+        'summarizer': get_summarizer,
+        'asr_pool': warm_worker_pool
+    }
+    data = request.get_json(silent=True) or {}
+    targets = data.get('models', list(loaders))
+    unknown = [t for t in targets if t not in loaders]
+    if unknown:
+        return jsonify({'error': f'Unknown models: {", ".join(unknown)}'}), 400
+
+    timings = {}
+    try:
+        for target in targets:
+            start_time = time.time()
+            loaders[target]()
+            timings[target] = round(time.time() - start_time, 2)
+    except Exception as e:
+        return jsonify({'error': f'Warmup failed: {str(e)}', 'warmup_seconds': timings}), 500
+
+    return jsonify({'warmup_seconds': timings, 'models': model_status()})
+
+
+def collect_job_metrics():
+    stats = job_queue.stats()
+    return [
+        ('cognivue_job_queue_depth', 'gauge', 'Jobs waiting to run', [({}, stats['queued'])]),
+        ('cognivue_jobs_running', 'gauge', 'Jobs currently running',
+         [({'type': job_type}, count) for job_type, count in stats['running'].items()]),
+        ('cognivue_job_workers', 'gauge', 'Job worker threads', [({}, stats['workers'])])
+    ]
+
+
+def collect_model_metrics():
+    return [
+        ('cognivue_models_loaded_mb', 'gauge', 'Approximate RAM of loaded models in this process',
+         [({}, loaded_size_mb())]),
+        ('cognivue_model_memory_budget_mb', 'gauge', 'Model memory budget', [({}, MODEL_MEMORY_BUDGET_MB)])
+    ]
+
+
+def collect_admission_metrics():
+    stats = {endpoint: limiter.stats() for endpoint, limiter in route_limiters.items()}
+    return [
+        ('cognivue_route_active_requests', 'gauge', 'Requests running per admission-limited route',
+         [({'route': route}, s['active']) for route, s in stats.items()]),
+        ('cognivue_route_waiting_requests', 'gauge', 'Requests waiting for a slot per route',
+         [({'route': route}, s['waiting']) for route, s in stats.items()]),
+        ('cognivue_route_rejected_total', 'counter', 'Requests turned away per route',
+         [({'route': route, 'reason': 'queue_full'}, s['rejected']) for route, s in stats.items()] +
+         [({'route': route, 'reason': 'wait_timeout'}, s['timed_out']) for route, s in stats.items()])
+    ]
+
+
+register_collector(collect_job_metrics)
+register_collector(collect_model_metrics)
+register_collector(collect_admission_metrics)
+register_collector(memory_governor.collect_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text format: per-stage timing histograms, queue depths, worker utilization, cache hit rates"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/models/status', methods=['GET'])
+def get_model_status():
+    return jsonify(model_status())
+
+
 @app.route('/process_supabase_file', methods=['POST'])
 def process_supabase_file():
     if not supabase:
@@ -133,9 +885,14 @@ def process_supabase_file():
         data = request.get_json()
         bucket_name = data.get('bucketName')
         file_name = data.get('fileName')
+        use_streaming = bool(data.get('streaming', False))
         
         if not bucket_name or not file_name:
             return jsonify({"error": "Missing bucketName or fileName"}), 400
+        try:
+            model_id = resolve_asr_model(data.get('model'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Start timer
         start_time = time.time()
@@ -143,8 +900,10 @@ def process_supabase_file():
         
         response = supabase.storage.from_(bucket_name).download(file_name)
         
-        # Use parallel processing for Supabase files too
-        result = transcribe_audio_parallel(response, num_processes=2, segment_length=30)
+        # Use parallel processing for Supabase files too; streaming decodes
+        # the downloaded bytes incrementally instead of via a temp file, and
+        # is also used when a full decode would not fit in memory
+        result = transcribe_within_budget(response, streaming=use_streaming, segmentation='vad', model_id=model_id)
         
         # Stop timer and calculate duration
         end_time = time.time()
@@ -161,10 +920,69 @@ def process_supabase_file():
             "processing_time_seconds": round(duration, 2)
         })
         
+    except MemoryBudgetExceeded as e:
+        print(f"Processing rejected: {str(e)}")
+        return memory_error(e)
     except Exception as e:
         print(f"Processing error: {str(e)}")
         return jsonify({"error": f"Processing error: {str(e)}"}), 500
 
+@app.route('/process_supabase_batch', methods=['POST'])
+def process_supabase_batch():
+    """Queue transcription of many objects in a bucket.
+
+    JSON: {"bucketName": ..., "prefix": "recordings/2025-" or "fileNames": [...],
+    "model": ..., "streaming": false, "priority": 20}. Poll /jobs/<job_id> for
+    per-file progress; the result holds each file's transcription.
+    """
+    if not supabase:
+        return jsonify({"error": "Supabase is not configured"}), 503
+
+    data = request.get_json(silent=True) or {}
+    bucket_name = data.get('bucketName')
+    prefix = data.get('prefix')
+    file_names = data.get('fileNames')
+    if not bucket_name or (prefix is None and not file_names):
+        return jsonify({"error": "Missing bucketName, and prefix or fileNames"}), 400
+    if file_names is not None and (not isinstance(file_names, list) or len(file_names) > INGEST_MAX_FILES):
+        return jsonify({"error": f"fileNames must be a list of at most {INGEST_MAX_FILES} paths"}), 400
+
+    try:
+        params = {
+            'bucket': bucket_name,
+            'prefix': prefix or '',
+            'files': file_names,
+            'model': resolve_asr_model(data.get('model')),
+            'streaming': bool(data.get('streaming', False))
+        }
+        # Backfills default to a lower priority than interactive jobs
+        job_id = job_queue.submit('supabase_batch', params, priority=int_param(data.get('priority'), 'priority', 20))
+    except QueueFull as e:
+        return jsonify({'error': f'Job queue is full: {str(e)}'}), 503, {'Retry-After': '30'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f'/jobs/{job_id}'
+    }), 202
+
+def start_background_services():
+    """Start the job workers and, in the background, the ASR worker pool.
+
+    Call once, in the process that serves requests: the job queue recovers
+    and runs persisted jobs on start.
+    """
+    job_queue.start()
+    # Warming runs in the background so the server accepts requests immediately
+    threading.Thread(target=warm_worker_pool, daemon=True).start()
+
+
 if __name__ == '__main__':
+    # Development server; use serve.py in production
     print("Starting transcription API server...")
+    # Only the serving process runs jobs and the pool, not the debug reloader's watcher
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     app.run(debug=True, host='0.0.0.0', port=5001)
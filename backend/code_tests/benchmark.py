@@ -0,0 +1,470 @@
+"""End-to-end benchmark of the transcription and summarization pipelines.
+
+Runs each scenario a fixed number of times after a warm-up run and writes
+p50/p95 latency, real-time factor, throughput and peak RSS to JSON.
+
+    python code_tests/benchmark.py                      # full run
+    python code_tests/benchmark.py --quick              # fewer scenarios and repeats
+    python code_tests/benchmark.py --baseline old.json  # flag regressions, exit 1 if any
+
+Result caches are disabled except in the cache hit/miss scenarios, so
+repeats measure real work.
+"""
+import os
+import sys
+import json
+import time
+import wave
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+# Add backend to path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import numpy as np
+
+RESULTS_DIR = backend_dir / "code_tests" / "benchmark_results"
+RSS_SAMPLE_SECONDS = 0.05
+
+
+def process_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+
+def child_pids(pid):
+    pids = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                pids.extend(int(p) for p in f.read().split())
+    except (OSError, ValueError):
+        pass
+    return pids + [grandchild for child in pids for grandchild in child_pids(child)]
+
+
+def total_rss_mb():
+    """RSS of this process and its worker processes together."""
+    pid = os.getpid()
+    return process_rss_mb(pid) + sum(process_rss_mb(child) for child in child_pids(pid))
+
+
+class PeakRSS:
+    """Sample total RSS in the background while a scenario runs.
+
+    Falls back to this process's lifetime peak where /proc is unavailable.
+    """
+
+    def __enter__(self):
+        self.peak_mb = total_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak_mb = max(self.peak_mb, total_rss_mb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak_mb:
+            self.peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize_latencies(latencies):
+    latencies = np.array(latencies)
+    return {
+        "runs": len(latencies),
+        "mean_seconds": round(float(latencies.mean()), 3),
+        "p50_seconds": round(float(np.percentile(latencies, 50)), 3),
+        "p95_seconds": round(float(np.percentile(latencies, 95)), 3),
+        "min_seconds": round(float(latencies.min()), 3)
+    }
+
+
+def run_scenario(name, fn, repeats, warmup, work_units=None, unit=None, audio_seconds=None, params=None):
+    """Time fn() repeats times after warmup unrecorded runs.
+
+    work_units/unit give throughput (e.g. audio seconds or words per second);
+    audio_seconds gives the real-time factor.
+    """
+    print(f"\n--- {name} ---")
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    details = {}
+    with PeakRSS() as rss:
+        for i in range(repeats):
+            start = time.perf_counter()
+            details = fn() or {}
+            latencies.append(time.perf_counter() - start)
+            print(f"  run {i + 1}/{repeats}: {latencies[-1]:.2f}s")
+
+    result = {"name": name, "params": params or {}, **summarize_latencies(latencies)}
+    p50 = result["p50_seconds"]
+    if audio_seconds:
+        result["audio_seconds"] = round(audio_seconds, 2)
+        result["real_time_factor"] = round(p50 / audio_seconds, 4)
+    if work_units and p50:
+        result[f"throughput_{unit}_per_second"] = round(work_units / p50, 2)
+    result["peak_rss_mb"] = round(rss.peak_mb, 1)
+    result["details"] = details
+    print(f"  p50 {p50:.2f}s  p95 {result['p95_seconds']:.2f}s  peak RSS {result['peak_rss_mb']:.0f} MB")
+    return result
+
+
+def write_wav(path, audio_data, sample_rate):
+    samples = (np.clip(audio_data, -1, 1) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def make_long_audio(audio_data, sample_rate, minutes, directory):
+    """Tile a sample recording into a synthetic long input."""
+    target = int(minutes * 60 * sample_rate)
+    repeats = -(-target // len(audio_data))
+    path = Path(directory) / f"synthetic_{minutes}min.wav"
+    write_wav(path, np.tile(audio_data, repeats)[:target], sample_rate)
+    return path
+
+
+def make_long_text(text, words):
+    """Shuffle a sample article's sentences into a synthetic long document."""
+    sentences = [s.strip() + "." for s in text.replace("\n", " ").split(".") if s.strip()]
+    rng = random.Random(0)
+    out, count = [], 0
+    while count < words:
+        sentence = rng.choice(sentences)
+        out.append(sentence)
+        count += len(sentence.split())
+    return " ".join(out)
+
+
+def disable_caches(directory):
+    """Swap the result caches for ones that never hit.
+
+    They read from directory, which must stay empty: entries another
+    server or an earlier phase wrote to CACHE_DIR would still be found.
+    """
+    from utils.result_cache import ResultCache
+    from utils.audio_cache import AudioCache
+    from models import asr_model, summarizer_model
+    asr_model.transcription_cache = ResultCache("transcriptions", directory=directory, memory_items=0, max_disk_bytes=0)
+    asr_model.audio_cache = AudioCache("audio", directory=directory, max_disk_bytes=0)
+    summarizer_model.summary_cache = ResultCache("summaries", directory=directory, memory_items=0, max_disk_bytes=0)
+
+
+def enable_caches(directory):
+    from utils.result_cache import ResultCache
+    from utils.audio_cache import AudioCache
+    from models import asr_model, summarizer_model
+    asr_model.transcription_cache = ResultCache("transcriptions", directory=directory)
+    asr_model.audio_cache = AudioCache("audio", directory=directory)
+    summarizer_model.summary_cache = ResultCache("summaries", directory=directory)
+
+
+def timed_call(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return round(time.perf_counter() - start, 3)
+
+
+def asr_scenarios(args, workdir):
+    from models import asr_model
+    from models.asr_model import (
+        load_audio, transcribe_audio_sequential, transcribe_audio_parallel,
+        transcribe_audio_streaming, warm_worker_pool, resize_worker_pool, ASR_POOL_SIZE
+    )
+
+    audio_files = sorted(
+        f for ext in ['*.wav', '*.mp3', '*.m4a', '*.webm']
+        for f in (backend_dir / "Sample_inputs" / "test_audio").glob(ext)
+    )
+    if not audio_files:
+        print("No audio files found in sample inputs, skipping ASR")
+        return []
+
+    sample = audio_files[0]
+    audio_data, sample_rate = load_audio(str(sample))
+    inputs = [("sample", sample, len(audio_data) / sample_rate)]
+    if args.long_audio_minutes:
+        long_path = make_long_audio(audio_data, sample_rate, args.long_audio_minutes, workdir)
+        inputs.append((f"synthetic_{args.long_audio_minutes}min", long_path, args.long_audio_minutes * 60))
+
+    print(f"Warming ASR worker pool ({ASR_POOL_SIZE} workers)")
+    warm_worker_pool()
+
+    segment_lengths = [30] if args.quick else [10, 20, 30]
+    pool_sizes = [ASR_POOL_SIZE] if args.quick else sorted({1, max(1, ASR_POOL_SIZE // 2), ASR_POOL_SIZE})
+
+    results = []
+    for label, path, seconds in inputs:
+        common = dict(repeats=args.repeats, warmup=args.warmup, work_units=seconds, unit="audio_seconds",
+                      audio_seconds=seconds)
+        results.append(run_scenario(
+            f"asr/sequential/{label}",
+            lambda: transcribe_audio_sequential(str(path)),
+            params={"input": label}, **common
+        ))
+        results.append(run_scenario(
+            f"asr/streaming/{label}",
+            lambda: transcribe_audio_streaming(path.read_bytes()),
+            params={"input": label}, **common
+        ))
+        results.append(run_scenario(
+            f"asr/planned/{label}",
+            lambda: {"plan": _planned(transcribe_audio_parallel, str(path))},
+            params={"input": label}, **common
+        ))
+
+    # Worker count sweep: the pool is restarted with each size, as a server
+    # started with that ASR_POOL_SIZE would run, and each request uses all of it
+    for pool_size in pool_sizes:
+        if pool_size != asr_model.ASR_POOL_SIZE:
+            print(f"Restarting ASR worker pool with {pool_size} workers")
+            resize_worker_pool(pool_size)
+            warm_worker_pool()
+        for label, path, seconds in inputs:
+            for segment_length in segment_lengths:
+                def parallel(path=path, segment_length=segment_length, pool_size=pool_size):
+                    plan = {}
+                    transcribe_audio_parallel(str(path), num_processes=pool_size,
+                                              segment_length=segment_length, segmentation="vad", stats=plan)
+                    return {"plan": plan}
+                results.append(run_scenario(
+                    f"asr/parallel/{label}/seg{segment_length}/pool{pool_size}",
+                    parallel,
+                    params={"input": label, "segment_length": segment_length, "pool_size": pool_size},
+                    repeats=args.repeats, warmup=args.warmup, work_units=seconds, unit="audio_seconds",
+                    audio_seconds=seconds
+                ))
+    if asr_model.ASR_POOL_SIZE != ASR_POOL_SIZE:
+        resize_worker_pool(ASR_POOL_SIZE)
+        warm_worker_pool()
+
+    # Cache: one cold call, then repeated hits
+    enable_caches(Path(workdir) / "cache")
+    cold = timed_call(transcribe_audio_parallel, str(sample))
+    results.append(run_scenario(
+        "asr/cache_hit/sample",
+        lambda: transcribe_audio_parallel(str(sample)),
+        repeats=args.repeats, warmup=0, params={"input": "sample", "miss_seconds": cold}
+    ))
+    print(f"  cache miss {cold:.2f}s, hit stats {asr_model.transcription_cache.stats()}")
+    disable_caches(Path(workdir) / "no-cache")
+    return results
+
+
+def _planned(transcribe, path):
+    plan = {}
+    transcribe(path, segmentation="vad", stats=plan)
+    return plan
+
+
+def summarizer_scenarios(args, workdir):
+    from models import summarizer_model
+    from models.summarizer_model import summarize_text
+
+    text_files = sorted((backend_dir / "Sample_inputs" / "test_text").glob("*.txt"))
+    if not text_files:
+        print("No text files found in sample inputs, skipping summarization")
+        return []
+
+    article = text_files[0].read_text(encoding="utf-8", errors="ignore").strip()
+    inputs = [("sample", article)]
+    if args.long_text_words:
+        inputs.append((f"synthetic_{args.long_text_words}words", make_long_text(article, args.long_text_words)))
+
+    print("Loading summarizer")
+    summarize_text("This is a warm-up sentence for the summarizer.", 50, 10)
+
+    results = []
+    for label, text in inputs:
+        words = len(text.split())
+        # The extractive pre-filter only changes anything on long inputs
+        for extractive in [None] + (["tfidf", "textrank"] if label != "sample" else []):
+
+            def summarize(text=text, extractive=extractive):
+                stats = {}
+                summarize_text(text, 130, 30, stats, extractive=extractive)
+                levels = stats.get("levels") or [{"inputs": 1}]
+                return {"reduce_depth": stats.get("depth"), "chunks": levels[0]["inputs"]}
+
+            results.append(run_scenario(
+                f"summarize/{label}" + (f"/{extractive}" if extractive else ""),
+                summarize,
+                repeats=args.repeats, warmup=args.warmup, work_units=words, unit="words",
+                params={"input": label, "words": words, "extractive": extractive}
+            ))
+
+    # Cache: one cold call, then repeated hits
+    enable_caches(Path(workdir) / "cache")
+    cold = timed_call(summarize_text, article, 130, 30)
+    results.append(run_scenario(
+        "summarize/cache_hit/sample",
+        lambda: summarize_text(article, 130, 30),
+        repeats=args.repeats, warmup=0, params={"input": "sample", "miss_seconds": cold}
+    ))
+    print(f"  cache miss {cold:.2f}s, hit stats {summarizer_model.summary_cache.stats()}")
+    disable_caches(Path(workdir) / "no-cache")
+    return results
+
+
+def pipeline_scenarios(args, workdir):
+    """Transcribe-and-summarize with the stages overlapped vs one after the other."""
+    from models.asr_model import load_audio, transcribe_audio_streaming, warm_worker_pool
+    from models.summarizer_model import summarize_text
+    from models.pipeline import iter_transcribe_and_summarize
+
+    audio_files = sorted(
+        f for ext in ['*.wav', '*.mp3', '*.m4a', '*.webm']
+        for f in (backend_dir / "Sample_inputs" / "test_audio").glob(ext)
+    )
+    if not audio_files:
+        print("No audio files found in sample inputs, skipping pipeline")
+        return []
+
+    audio_data, sample_rate = load_audio(str(audio_files[0]))
+    inputs = [("sample", audio_files[0], len(audio_data) / sample_rate)]
+    if args.long_audio_minutes:
+        long_path = make_long_audio(audio_data, sample_rate, args.long_audio_minutes, workdir)
+        inputs.append((f"synthetic_{args.long_audio_minutes}min", long_path, args.long_audio_minutes * 60))
+    warm_worker_pool()
+    summarize_text("This is a warm-up sentence for the summarizer.", 50, 10)
+
+    results = []
+    for label, path, seconds in inputs:
+        common = dict(repeats=args.repeats, warmup=args.warmup, work_units=seconds, unit="audio_seconds",
+                      audio_seconds=seconds, params={"input": label})
+
+        def overlapped(path=path):
+            stats = {}
+            for _ in iter_transcribe_and_summarize(path.read_bytes(), stats=stats):
+                pass
+            return {"chunks": stats.get("chunks"),
+                    "chunks_summarized_during_transcription": stats.get("chunks_summarized_during_transcription")}
+
+        results.append(run_scenario(f"pipeline/overlapped/{label}", overlapped, **common))
+        results.append(run_scenario(
+            f"pipeline/sequential/{label}",
+            lambda path=path: summarize_text(transcribe_audio_streaming(path.read_bytes()), 130, 30),
+            **common
+        ))
+    return results
+
+
+def environment():
+    from models.asr_model import MODEL_ID as ASR_MODEL_ID, ASR_BACKEND, ASR_POOL_SIZE, ASR_MAX_BATCH_SIZE
+    from models.summarizer_model import MODEL_ID as SUMMARIZER_MODEL_ID, SUMMARIZER_BACKEND
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=backend_dir,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "asr_model": ASR_MODEL_ID,
+        "asr_backend": ASR_BACKEND,
+        "asr_pool_size": ASR_POOL_SIZE,
+        "asr_max_batch_size": ASR_MAX_BATCH_SIZE,
+        "summarizer_model": SUMMARIZER_MODEL_ID,
+        "summarizer_backend": SUMMARIZER_BACKEND
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p50 changes against a previous run; return the names that regressed."""
+    with open(baseline_path) as f:
+        baseline = {s["name"]: s for s in json.load(f)["scenarios"]}
+
+    print(f"\n=== COMPARISON WITH {baseline_path} (tolerance {tolerance:.0%}) ===")
+    regressions = []
+    for scenario in results:
+        before = baseline.get(scenario["name"])
+        if not before or not before["p50_seconds"]:
+            continue
+        change = scenario["p50_seconds"] / before["p50_seconds"] - 1
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(scenario["name"])
+        print(f"{'✗' if regressed else '✓'} {scenario['name']}: "
+              f"{before['p50_seconds']:.2f}s -> {scenario['p50_seconds']:.2f}s ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--long-audio-minutes", type=int, default=10, help="0 to skip synthetic long audio")
+    parser.add_argument("--long-text-words", type=int, default=10000, help="0 to skip synthetic long text")
+    parser.add_argument("--only", choices=["asr", "summarize", "pipeline"])
+    parser.add_argument("--quick", action="store_true", help="3 repeats, one segment size and pool size")
+    parser.add_argument("--output", help="JSON path (default code_tests/benchmark_results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p50 slowdown vs baseline")
+    args = parser.parse_args()
+    if args.quick:
+        args.repeats = min(args.repeats, 3)
+
+    print("PIPELINE BENCHMARK")
+    print("=" * 50)
+
+    started = time.time()
+    scenarios = []
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+        disable_caches(Path(workdir) / "no-cache")
+        if args.only in (None, "asr"):
+            scenarios.extend(asr_scenarios(args, workdir))
+        if args.only in (None, "summarize"):
+            scenarios.extend(summarizer_scenarios(args, workdir))
+        if args.only in (None, "pipeline"):
+            scenarios.extend(pipeline_scenarios(args, workdir))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duration_seconds": round(time.time() - started, 1),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "environment": environment(),
+        "scenarios": scenarios
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\n✓ Results written to {output}")
+
+    if args.baseline:
+        regressions = compare(scenarios, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} scenario(s) regressed")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def test_refine_reasons():
+    print("=== REFINE REASONS ===")
+    from utils.confidence import refine_reason, compression_ratio
+    cases = [
+        (("", None, None), "empty"),
+        (("", -2.0, 0.9), None),
+        (("thanks " * 30, -0.2, 0.05), "repetition"),
+        (("Thanks for watching.", -0.3, 0.8), "no_speech"),
+        (("the leg to stand on", -1.4, 0.1), "low_logprob"),
+        (("the leg to stand on", -0.3, 0.1), None),
+    ]
+    passed = True
+    for args, expected in cases:
+        reason = refine_reason(*args)
+        print(f"  {args[0][:30]!r} logprob={args[1]} no_speech={args[2]} -> {reason}")
+        passed = passed and reason == expected
+    print(f"  compression ratio of a loop: {compression_ratio('thanks ' * 30):.2f}")
+    return passed
+
+
+def run_draft_and_refine(audio_file):
+    print("=== DRAFT THEN REFINE ===")
+    from models.asr_model import (transcribe_audio_draft, score_segments, refine_segments, segments_text,
+                                  warm_worker_pool, DRAFT_MODEL_ID, REFINE_MODEL_ID)
+    warm_worker_pool()
+    audio_bytes = audio_file.read_bytes()
+
+    start = time.time()
+    segments = transcribe_audio_draft(audio_bytes, model_id=DRAFT_MODEL_ID)
+    draft_seconds = time.time() - start
+    print(f"Draft with {DRAFT_MODEL_ID}: {len(segments)} segments in {draft_seconds:.2f}s")
+
+    start = time.time()
+    segments = score_segments(audio_bytes, segments, DRAFT_MODEL_ID)
+    to_refine = [s for s in segments if s["refine"]]
+    print(f"Scored in {time.time() - start:.2f}s, {len(to_refine)} to refine")
+    for s in segments:
+        print(f"  [{s['start']:.1f}-{s['end']:.1f}] logprob={s['avg_logprob']} "
+              f"no_speech={s['no_speech_prob']} refine={s['refine']}: {s['text'][:60]}")
+
+    start = time.time()
+    refined = refine_segments(
+        audio_bytes, segments, REFINE_MODEL_ID,
+        progress=lambda done, total, texts: print(f"  refined {done}/{total}")
+    )
+    refine_seconds = time.time() - start
+    print(f"Refined with {REFINE_MODEL_ID} in {refine_seconds:.2f}s")
+    print(f"Draft:   {segments_text(segments)[:200]}")
+    print(f"Refined: {segments_text(refined)[:200]}")
+
+    # Only the flagged segments may change
+    untouched = all(r["text"] == s["text"] for r, s in zip(refined, segments) if not s["refine"])
+    return bool(segments) and untouched and sum(r["refined"] for r in refined) <= len(to_refine)
+
+
+def main():
+    print("TWO-TIER (DRAFT + REFINE) TRANSCRIPTION TEST")
+    print("=" * 50)
+    audio_dir = backend_dir / "Sample_inputs" / "test_audio"
+    audio_files = [f for ext in ['*.wav', '*.mp3', '*.m4a', '*.webm'] for f in audio_dir.glob(ext)]
+    if not audio_files:
+        print("No audio files found in sample inputs")
+        return
+
+    results = {"refine reasons": test_refine_reasons(), "draft and refine": run_draft_and_refine(audio_files[0])}
+    print()
+    for name, passed in results.items():
+        print(f"{'✓' if passed else '✗'} {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path for imports
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Backend compared against the fp32 pytorch output
+BACKEND = os.getenv("COMPARE_BACKEND", "int8")
+MAX_WORD_ERROR_RATE = 0.15
+MIN_SUMMARY_OVERLAP = 0.5
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level edit distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def word_overlap(reference, candidate):
+    """Share of the reference's distinct words that also appear in the candidate"""
+    ref = set(reference.lower().split())
+    return len(ref & set(candidate.lower().split())) / len(ref) if ref else 1.0
+
+
+def timed(fn, *args, **kwargs):
+    start = time.time()
+    result = fn(*args, **kwargs)
+    return result, time.time() - start
+
+
+def test_asr_backend_accuracy():
+    """Compare Whisper on BACKEND against fp32 on Sample_inputs/test_audio"""
+    print(f"=== ASR: pytorch vs {BACKEND} ===")
+    from models.asr_model import create_asr_pipeline, load_audio, MODEL_ID
+
+    audio_dir = backend_dir / "Sample_inputs" / "test_audio"
+    audio_files = [f for ext in ['*.wav', '*.mp3', '*.m4a', '*.webm'] for f in audio_dir.glob(ext)]
+    if not audio_files:
+        print("No audio files found in sample inputs")
+        return False
+
+    reference_pipe = create_asr_pipeline(MODEL_ID, backend="pytorch")
+    candidate_pipe = create_asr_pipeline(MODEL_ID, backend=BACKEND)
+
+    passed = True
+    for audio_file in audio_files:
+        # Whisper's single pass covers 30s, which is enough for a comparison
+        audio_data, sample_rate = load_audio(str(audio_file))
+        audio_data = audio_data[:30 * sample_rate]
+
+        reference, reference_time = timed(reference_pipe, audio_data)
+        candidate, candidate_time = timed(candidate_pipe, audio_data)
+        wer = word_error_rate(reference["text"], candidate["text"])
+
+        print(f"{audio_file.name}:")
+        print(f"  pytorch: {reference_time:.2f}s  {BACKEND}: {candidate_time:.2f}s  speedup: {reference_time / candidate_time:.2f}x")
+        print(f"  WER vs pytorch: {wer:.3f} (limit {MAX_WORD_ERROR_RATE})")
+        if wer > MAX_WORD_ERROR_RATE:
+            print(f"  pytorch: {reference['text']}")
+            print(f"  {BACKEND}: {candidate['text']}")
+            passed = False
+    return passed
+
+
+def test_summarizer_backend_accuracy():
+    """Compare BART on BACKEND against fp32 on Sample_inputs/test_text"""
+    print(f"=== SUMMARIZER: pytorch vs {BACKEND} ===")
+    from models.summarizer_model import create_summarizer
+
+    text_files = list((backend_dir / "Sample_inputs" / "test_text").glob("*.txt"))
+    if not text_files:
+        print("No text files found in sample inputs")
+        return False
+
+    reference_pipe = create_summarizer(backend="pytorch")
+    candidate_pipe = create_summarizer(backend=BACKEND)
+
+    passed = True
+    for text_file in text_files:
+        text = text_file.read_text(encoding='utf-8', errors='ignore').strip()
+        kwargs = {'max_length': 130, 'min_length': 30, 'truncation': True}
+
+        reference, reference_time = timed(reference_pipe, text, **kwargs)
+        candidate, candidate_time = timed(candidate_pipe, text, **kwargs)
+        overlap = word_overlap(reference[0]["summary_text"], candidate[0]["summary_text"])
+
+        print(f"{text_file.name}:")
+        print(f"  pytorch: {reference_time:.2f}s  {BACKEND}: {candidate_time:.2f}s  speedup: {reference_time / candidate_time:.2f}x")
+        print(f"  word overlap vs pytorch: {overlap:.3f} (minimum {MIN_SUMMARY_OVERLAP})")
+        if overlap < MIN_SUMMARY_OVERLAP:
+            print(f"  pytorch: {reference[0]['summary_text']}")
+            print(f"  {BACKEND}: {candidate[0]['summary_text']}")
+            passed = False
+    return passed
+
+
+def main():
+    print("INFERENCE BACKEND ACCURACY CHECK")
+    print("=" * 50)
+    print(f"Comparing {BACKEND} against fp32 pytorch (set COMPARE_BACKEND to change)\n")
+
+    results = {
+        'asr': test_asr_backend_accuracy(),
+        'summarizer': test_summarizer_backend_accuracy()
+    }
+
+    print()
+    for name, passed in results.items():
+        print(f"{'✓' if passed else '✗'} {name} ({BACKEND})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,397 @@
 import os
+import atexit
 import tempfile
-import librosa
-from transformers import pipeline
+import threading
+from functools import partial
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from concurrent.futures import ProcessPoolExecutor
+from models.model_registry import register_model, get_model, is_loaded, record_latency
+from models.inference_backend import build_pipeline, resolve_backend, INFERENCE_BACKEND
+from utils.shared_audio import shared_audio, attach_shared_segment, create_shared_audio, release_shared_audio
+from utils.audio_stream import stream_audio_frames
+from utils.vad import vad_segments
+from utils.result_cache import ResultCache, hash_source, make_key
+from utils.audio_cache import AudioCache
+from utils.parallelism import plan_parallelism, default_pool_size, MAX_PROCESSES, MAX_SEGMENT_LENGTH
+from utils import memory_governor
+from utils.memory_governor import MemoryBudgetExceeded, estimate_audio_seconds, decoded_audio_mb, process_rss_mb
+from utils.metrics import observe, timed, timed_iter, register_collector, cache_metrics
+from utils.transcript_merge import merge_segments
+from utils.confidence import score_transcript, refine_reason
+from models.batch_scheduler import BatchScheduler
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 import time
 
 load_dotenv()
 
 HF_TOKEN = os.getenv("HF_TOKEN")
-MODEL_ID = "openai/whisper-tiny"
 
-# Create a global pipeline for sequential transcription
-asr_pipeline = pipeline(
-    "automatic-speech-recognition",
-    model=MODEL_ID,
-    token=HF_TOKEN    
+# Selectable ASR models and their approximate fp32 RAM footprint in MB
+ASR_MODELS = {
+    "openai/whisper-tiny": 150,
+    "openai/whisper-small": 1000,
+    "openai/whisper-medium": 3100,
+    "openai/whisper-large": 6200
+}
+MODEL_ID = os.getenv("ASR_MODEL_ID", "openai/whisper-tiny")
+# Two-tier transcription: a fast draft model, and the larger model that
+# re-transcribes only the draft segments it was unsure of
+DRAFT_MODEL_ID = os.getenv("DRAFT_ASR_MODEL_ID", "openai/whisper-tiny")
+REFINE_MODEL_ID = os.getenv("REFINE_ASR_MODEL_ID", "openai/whisper-small")
+
+# pytorch, int8 or onnx; see models/inference_backend.py
+ASR_BACKEND = resolve_backend(os.getenv("ASR_BACKEND", INFERENCE_BACKEND))
+# int8 weights take roughly 40% of the fp32 footprint
+BACKEND_SIZE_FACTOR = {"int8": 0.4}
+
+# Shortest segment VAD segmentation will cut at a pause
+VAD_MIN_SEGMENT_LENGTH = float(os.getenv("VAD_MIN_SEGMENT_LENGTH", "5"))
+# Share of the audio VAD must find speech in; below it fixed cuts are used
+VAD_MIN_SPEECH_RATIO = float(os.getenv("VAD_MIN_SPEECH_RATIO", "0.01"))
+
+# Seconds shared by neighbouring fixed segments, de-duplicated on merge
+ASR_SEGMENT_OVERLAP = float(os.getenv("ASR_SEGMENT_OVERLAP", "1.0"))
+# Times a failed segment is resubmitted before it is left out
+ASR_SEGMENT_RETRIES = int(os.getenv("ASR_SEGMENT_RETRIES", "2"))
+
+# Warm worker pool settings; by default sized to the host's cores and memory
+ASR_POOL_SIZE = int(os.getenv("ASR_POOL_SIZE", "0")) or default_pool_size(
+    ASR_MODELS.get(MODEL_ID, 0) * BACKEND_SIZE_FACTOR.get(ASR_BACKEND, 1)
 )
+ASR_MAX_TASKS_PER_WORKER = int(os.getenv("ASR_MAX_TASKS_PER_WORKER", "200"))
+ASR_HEALTH_CHECK_TIMEOUT = float(os.getenv("ASR_HEALTH_CHECK_TIMEOUT", "120"))
+
+# Micro-batching of segments across concurrent requests
+ASR_MAX_BATCH_SIZE = int(os.getenv("ASR_MAX_BATCH_SIZE", "8"))
+ASR_MAX_BATCH_WAIT_MS = int(os.getenv("ASR_MAX_BATCH_WAIT_MS", "20"))
+
+# Full decoding holds the waveform, librosa's resampling copy and the shared
+# memory copy the workers read from
+DECODE_MEMORY_FACTOR = 3
+
+# Transcripts keyed by audio content hash, model and segmentation parameters
+transcription_cache = ResultCache("transcriptions")
+# Decoded audio keyed by content hash, decoder and sample rate, so
+# re-processing a file with another model or other parameters skips decoding
+audio_cache = AudioCache("audio")
+
+def transcription_cache_key(source_hash, model_id, *params):
+    return make_key(source_hash, model_id, ASR_BACKEND, *params)
 
-def create_asr_pipeline():
-    """Create a new ASR pipeline for each parallel worker."""
-    return pipeline(
+def audio_cache_key(source_hash, decoder, sample_rate=16000):
+    """Decoders resample differently, so librosa and ffmpeg output are cached apart."""
+    return make_key(source_hash, "decoded", decoder, sample_rate)
+
+def create_asr_pipeline(model_id=MODEL_ID, backend=None):
+    """Build the ASR pipeline. transformers is imported here so that processes
+    which never transcribe don't pay for it."""
+    return build_pipeline(
         "automatic-speech-recognition",
-        model=MODEL_ID,
-        token=HF_TOKEN  
+        model_id,
+        token=HF_TOKEN,
+        backend=backend or ASR_BACKEND
+    )
+
+# Loaded lazily on first use, once per process (server or pool worker). Each
+# process keeps as many loaded as fit in MODEL_MEMORY_BUDGET_MB, evicting the
+# least recently used.
+for _model_id, _size_mb in ASR_MODELS.items():
+    register_model(
+        _model_id,
+        partial(create_asr_pipeline, _model_id),
+        size_mb=int(_size_mb * BACKEND_SIZE_FACTOR.get(ASR_BACKEND, 1))
+    )
+if MODEL_ID not in ASR_MODELS:
+    register_model(MODEL_ID, partial(create_asr_pipeline, MODEL_ID))
+
+def resolve_asr_model(model_id=None):
+    """Return model_id, or the default model when None; unknown models raise ValueError."""
+    model_id = model_id or MODEL_ID
+    if model_id != MODEL_ID and model_id not in ASR_MODELS:
+        raise ValueError(f"Unknown ASR model: {model_id}. Available: {', '.join(get_available_asr_models())}")
+    return model_id
+
+def get_asr_pipeline(model_id=MODEL_ID):
+    return get_model(model_id)
+
+_pool = None
+_pool_lock = threading.Lock()
+# Models the pool workers have been asked to run, so each worker holds a copy
+_worker_models = {MODEL_ID}
+
+def _init_worker():
+    """Load the default ASR model once when a pool worker starts."""
+    get_asr_pipeline()
+
+def _ping_worker(_=None):
+    """Health check task; reports the worker pid and whether its model is loaded."""
+    return os.getpid(), is_loaded(MODEL_ID)
+
+def get_worker_pool():
+    """Return the shared ASR worker pool, starting it on first use.
+
+    Workers load the model once at startup and are recycled after
+    ASR_MAX_TASKS_PER_WORKER tasks to keep memory growth in check.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and getattr(_pool, "_broken", False):
+            # A worker died; replace the pool so retried segments have somewhere to go
+            print("ASR worker pool is broken, starting a new one")
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            print(f"Starting ASR worker pool with {ASR_POOL_SIZE} workers")
+            _pool = ProcessPoolExecutor(
+                max_workers=ASR_POOL_SIZE,
+                initializer=_init_worker,
+                max_tasks_per_child=ASR_MAX_TASKS_PER_WORKER or None
+            )
+        return _pool
+
+def shutdown_worker_pool(wait_for_tasks=False):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait_for_tasks, cancel_futures=True)
+            _pool = None
+
+def restart_worker_pool():
+    """Throw away a broken or unhealthy pool and start a fresh one."""
+    print("Restarting ASR worker pool")
+    shutdown_worker_pool()
+    return get_worker_pool()
+
+def resize_worker_pool(size):
+    """Restart the pool with size workers, as if started with ASR_POOL_SIZE=size.
+
+    Meant for benchmarks: running requests are waited for, and the batch
+    schedulers are replaced so their in-flight limit follows the new size.
+    """
+    global ASR_POOL_SIZE
+    shutdown_worker_pool(wait_for_tasks=True)
+    with _pool_lock:
+        ASR_POOL_SIZE = max(1, size)
+        _schedulers.clear()
+    return get_worker_pool()
+
+def warm_worker_pool():
+    """Start every worker and wait until each has loaded the model."""
+    return check_worker_pool(timeout=ASR_HEALTH_CHECK_TIMEOUT)
+
+def check_worker_pool(timeout=None, restart_on_failure=True):
+    """Ping each worker and report pool health.
+
+    Only a broken pool or a dead worker process counts as unhealthy and
+    triggers a restart. Workers still busy with long segments may miss the
+    timeout; the pool is then reported busy and left running. A worker
+    without the model loaded is fine, the registry evicts models routinely.
+    """
+    timeout = ASR_HEALTH_CHECK_TIMEOUT if timeout is None else timeout
+    pool = get_worker_pool()
+    results, not_done, broken = [], (), False
+    try:
+        futures = [pool.submit(_ping_worker) for _ in range(ASR_POOL_SIZE)]
+        done, not_done = wait(futures, timeout=timeout)
+        results = [f.result() for f in done]
+    except BrokenProcessPool:
+        broken = True
+
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    dead = [p.pid for p in processes if p.exitcode is not None and p.exitcode != 0]
+    healthy = not broken and not getattr(pool, "_broken", False) and not dead
+
+    if not healthy and restart_on_failure:
+        restart_worker_pool()
+
+    return {
+        "healthy": healthy,
+        "busy": healthy and bool(not_done),
+        "workers_alive": sum(1 for p in processes if p.is_alive()),
+        "models_loaded": sum(1 for _, loaded in results if loaded),
+        "pool_size": ASR_POOL_SIZE,
+        "max_tasks_per_worker": ASR_MAX_TASKS_PER_WORKER,
+        "worker_pids": sorted({pid for pid, _ in results}),
+        "batching": {model_id: scheduler.stats() for model_id, scheduler in list(_schedulers.items())}
+    }
+
+atexit.register(shutdown_worker_pool)
+
+# Transcriptions currently running in this process, used to share the pool
+_active_requests = 0
+_active_lock = threading.Lock()
+
+@contextmanager
+def _track_request():
+    global _active_requests
+    with _active_lock:
+        _active_requests += 1
+    try:
+        yield
+    finally:
+        with _active_lock:
+            _active_requests -= 1
+
+def plan_transcription(duration=None, num_processes=None, segment_length=None):
+    """Plan a request that is already counted in _active_requests."""
+    return plan_parallelism(
+        duration,
+        pool_size=ASR_POOL_SIZE,
+        batch_size=ASR_MAX_BATCH_SIZE,
+        active_requests=max(1, _active_requests),
+        num_processes=num_processes,
+        segment_length=segment_length
     )
 
-def load_audio(file_like):
-    """Handles uploaded file objects or raw bytes safely."""
+# One scheduler per model, since a batch must run through a single model
+_schedulers = {}
+
+def get_batch_scheduler(model_id=MODEL_ID):
+    """Return the scheduler that batches segments from all in-flight requests for model_id."""
+    with _pool_lock:
+        if model_id not in _schedulers:
+            _schedulers[model_id] = BatchScheduler(
+                lambda items: _submit_batch(items, model_id),
+                max_batch_size=ASR_MAX_BATCH_SIZE,
+                max_wait_ms=ASR_MAX_BATCH_WAIT_MS,
+                max_in_flight=ASR_POOL_SIZE
+            )
+        return _schedulers[model_id]
+
+def _submit_batch(items, model_id):
+    """Run a batch on the pool, timing it from dispatch to result."""
+    start = time.time()
+    _worker_models.add(model_id)
+    future = get_worker_pool().submit(transcribe_shared_batch, items, model_id)
+
+    def done(_):
+        elapsed = time.time() - start
+        observe("asr_batch", elapsed)
+        for _ in items:
+            observe("segment_inference", elapsed / len(items))
+
+    future.add_done_callback(done)
+    return future
+
+def worker_memory_mb():
+    """Resident memory of the pool workers, models included."""
+    pool = _pool
+    processes = dict(getattr(pool, "_processes", None) or {}) if pool is not None else {}
+    return sum(process_rss_mb(pid) for pid in processes)
+
+memory_governor.register_usage(worker_memory_mb)
+
+def model_size_mb(model_id):
+    return int(ASR_MODELS.get(model_id, 0) * BACKEND_SIZE_FACTOR.get(ASR_BACKEND, 1))
+
+def _worker_model_mb(model_id):
+    """Memory the pool still needs before every worker can run model_id."""
+    return 0 if model_id in _worker_models else ASR_POOL_SIZE * model_size_mb(model_id)
+
+def plan_memory(num_bytes, model_id=MODEL_ID, streaming=False, num_processes=None, seconds=None):
+    """Fit a transcription of num_bytes of compressed audio into the memory budget.
+
+    seconds is the audio's duration (see memory_governor.audio_seconds);
+    without it the longest duration num_bytes could hold is assumed.
+
+    A full decode holds the whole waveform several times over, so when it
+    does not fit the request is downgraded to streaming decode, whose memory
+    only depends on how many frames are in flight; if even that does not
+    fit, fewer frames are kept in flight. A model the workers do not hold
+    yet is swapped for the largest smaller one that fits. Returns a dict
+    with the model_id, streaming and num_processes to use, the MB to
+    reserve and a list of downgrades, or raises MemoryBudgetExceeded.
+    """
+    free = memory_governor.available_mb()
+    downgrades = []
+
+    if _worker_model_mb(model_id) > free:
+        smaller = [
+            m for m in sorted(ASR_MODELS, key=model_size_mb, reverse=True)
+            if model_size_mb(m) < model_size_mb(model_id) and _worker_model_mb(m) <= free
+        ]
+        if not smaller:
+            memory_governor.record_rejection()
+            raise MemoryBudgetExceeded(
+                f"Not enough memory to load {model_id} in the ASR workers",
+                _worker_model_mb(model_id), max(0, free)
+            )
+        downgrades.append(f"model {model_id} -> {smaller[0]}")
+        model_id = smaller[0]
+
+    room = min(free - _worker_model_mb(model_id), memory_governor.REQUEST_MEMORY_BUDGET_MB)
+    upload_mb = (num_bytes or 0) / (1024 * 1024)
+    if not streaming:
+        if seconds is None:
+            seconds = estimate_audio_seconds(num_bytes or 0)
+        full_mb = upload_mb + decoded_audio_mb(seconds) * DECODE_MEMORY_FACTOR
+        if full_mb <= room:
+            return {"model_id": model_id, "streaming": False, "num_processes": num_processes,
+                    "reserve_mb": int(full_mb) + 1, "downgrades": downgrades}
+        downgrades.append("streaming decode")
+        streaming = True
+
+    def streaming_mb(processes):
+        return upload_mb + decoded_audio_mb(processes * ASR_MAX_BATCH_SIZE * MAX_SEGMENT_LENGTH)
+
+    requested = num_processes or min(ASR_POOL_SIZE, MAX_PROCESSES)
+    processes = requested
+    while processes > 1 and streaming_mb(processes) > room:
+        processes -= 1
+    if streaming_mb(processes) > room:
+        memory_governor.record_rejection()
+        raise MemoryBudgetExceeded(
+            f"Transcription needs about {int(streaming_mb(1)) + 1} MB even when streamed, "
+            f"only {max(0, int(room))} MB is available",
+            int(streaming_mb(1)) + 1, max(0, int(room)),
+            retryable=room < memory_governor.REQUEST_MEMORY_BUDGET_MB
+        )
+    if processes < requested:
+        downgrades.append(f"num_processes {requested} -> {processes}")
+        num_processes = processes
+    return {"model_id": model_id, "streaming": streaming, "num_processes": num_processes,
+            "reserve_mb": int(streaming_mb(processes)) + 1, "downgrades": downgrades}
+
+@contextmanager
+def reserve_transcription(num_bytes, model_id=MODEL_ID, streaming=False, num_processes=None, seconds=None):
+    """plan_memory, holding the planned memory until the block exits."""
+    plan = plan_memory(num_bytes, model_id, streaming, num_processes, seconds)
+    if plan["downgrades"]:
+        print(f"Memory governor downgraded transcription: {', '.join(plan['downgrades'])}")
+    with memory_governor.reserve(plan["reserve_mb"], "transcription"):
+        yield plan
+
+def load_audio(file_like, source_hash=None):
+    """Handles uploaded file objects or raw bytes safely.
+
+    Decoded audio is cached by content hash (pass source_hash if already
+    known); a hit returns a read-only memory-mapped array.
+    """
+    key = audio_cache_key(source_hash or hash_source(file_like), "librosa")
+    cached = audio_cache.get(key)
+    if cached is not None:
+        return cached, 16000
+
     tmp_file = None
     try:
         if hasattr(file_like, 'read') or isinstance(file_like, bytes):
-            tmp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            if hasattr(file_like, 'read'):
-                file_like.seek(0)
-                tmp_file.write(file_like.read())
-            else:
-                tmp_file.write(file_like)
-            tmp_file.close()
+            with timed("upload_read"):
+                tmp_file = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+                if hasattr(file_like, 'read'):
+                    file_like.seek(0)
+                    tmp_file.write(file_like.read())
+                else:
+                    tmp_file.write(file_like)
+                tmp_file.close()
             path = tmp_file.name
         else:
             path = file_like
 
-        audio_data, sample_rate = librosa.load(path, sr=16000)
+        import librosa
+        with timed("decode"):
+            audio_data, sample_rate = librosa.load(path, sr=16000)
+        audio_cache.set(key, audio_data)
         return audio_data, sample_rate
 
     finally:
@@ -50,11 +399,30 @@ def load_audio(file_like):
             try: os.unlink(tmp_file.name)
             except: pass
 
-def transcribe_audio_sequential(file_like):
+def transcribe_audio_sequential(file_like, model_id=MODEL_ID):
     """Sequential transcription."""
-    audio_data, _ = load_audio(file_like)
-    result = asr_pipeline(audio_data)
-    return result["text"] if isinstance(result, dict) else str(result)
+    source_hash = hash_source(file_like)
+    cache_key = transcription_cache_key(source_hash, model_id, "sequential")
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        print("Transcription cache hit")
+        return cached
+
+    start = time.time()
+    audio_data, sample_rate = load_audio(file_like, source_hash)
+    text = _transcribe_whole(audio_data, sample_rate, model_id, start)
+    if text.strip():
+        transcription_cache.set(cache_key, text)
+    return text
+
+def _transcribe_whole(audio_data, sample_rate, model_id, start):
+    """Run already decoded audio through the in-process pipeline in one call."""
+    pipe = get_asr_pipeline(model_id)
+    with timed("inference"):
+        result = pipe(audio_data)
+    text = result["text"] if isinstance(result, dict) else str(result)
+    record_latency(model_id, time.time() - start, len(audio_data) / sample_rate)
+    return text
 
 def split_audio(audio_data, sample_rate, segment_length):
     segment_samples = int(segment_length * sample_rate)
@@ -63,47 +431,590 @@ def split_audio(audio_data, sample_rate, segment_length):
         for i in range(0, len(audio_data), segment_samples)
     ]
 
-def transcribe_segment(args):
+def split_audio_offsets(num_samples, sample_rate, segment_length, overlap=0):
+    """Like split_audio, but returns (index, offset, length) in samples instead of slices.
+
+    Consecutive segments share overlap seconds (at most half a segment).
+    """
+    segment_samples = int(segment_length * sample_rate)
+    overlap_samples = int(min(max(overlap, 0), segment_length / 2) * sample_rate)
+    step = max(1, segment_samples - overlap_samples)
+    offsets = []
+    for i in range(0, max(num_samples, 0), step):
+        offsets.append((i, i, min(segment_samples, num_samples - i)))
+        if i + segment_samples >= num_samples:
+            break
+    return offsets
+
+def segment_audio(audio_data, sample_rate, segment_length, segmentation="fixed", overlap=0):
+    """Return (index, offset, length) segments using fixed cuts or VAD.
+
+    With "vad", silence is dropped and cuts land on pauses, with segment_length
+    as the maximum segment duration. If VAD finds speech in less than
+    VAD_MIN_SPEECH_RATIO of the audio, it is more likely wrong than the audio
+    silent, so the audio is cut into fixed segments without overlap instead.
+    Fixed cuts overlap by overlap seconds.
+    """
+    if segmentation == "vad":
+        segments = vad_segments(
+            audio_data,
+            sample_rate,
+            min_segment_length=min(VAD_MIN_SEGMENT_LENGTH, segment_length),
+            max_segment_length=segment_length
+        )
+        if sum(length for _, _, length in segments) >= VAD_MIN_SPEECH_RATIO * len(audio_data):
+            return segments
+        print("VAD found almost no speech, falling back to fixed segments")
+        overlap = 0
+    return split_audio_offsets(len(audio_data), sample_rate, segment_length, overlap)
+
+def transcribe_segment(args, model_id=MODEL_ID):
     index, segment = args
     try:
-        p = create_asr_pipeline()
+        p = get_asr_pipeline(model_id)
         result = p(segment)
         text = result["text"] if isinstance(result, dict) else str(result)
         return index, text
     except Exception:
         return index, ""
 
-def transcribe_audio_parallel(file_like, num_processes=6, segment_length=15):
-    audio_data, sample_rate = load_audio(file_like)
-    duration = len(audio_data) / sample_rate
+def _segment_result(index, output):
+    """(index, text, chunks) from a pipeline output; chunks are Whisper's (start, end, text) timestamps."""
+    if not isinstance(output, dict):
+        return index, str(output), None
+    chunks = output.get("chunks")
+    if chunks is not None:
+        chunks = [(c["timestamp"][0], c["timestamp"][1], c["text"]) for c in chunks]
+    return index, output["text"], chunks
+
+def transcribe_shared_segment(args, model_id=MODEL_ID):
+    """Transcribe a segment read in place from a shared audio block.
+
+    Returns (index, None, None) on failure so the caller can retry it.
+    """
+    index, shm_name, offset, length = args
+    try:
+        shm, segment = attach_shared_segment(shm_name, offset, length)
+    except Exception:
+        return index, None, None
+    try:
+        p = get_asr_pipeline(model_id)
+        return _segment_result(index, p(segment, return_timestamps=True))
+    except Exception as e:
+        print(f"Segment {index} failed: {e}")
+        return index, None, None
+    finally:
+        del segment
+        shm.close()
+
+def transcribe_shared_batch(items, model_id=MODEL_ID):
+    """Transcribe a batch of shared-memory segments in one batched pipeline call.
+
+    items may come from different requests; results are returned in the same
+    order as (index, text, chunks) tuples.
+    """
+    shms, segments = [], []
+    try:
+        for _, shm_name, offset, length in items:
+            shm, segment = attach_shared_segment(shm_name, offset, length)
+            shms.append(shm)
+            segments.append(segment)
+        p = get_asr_pipeline(model_id)
+        outputs = p(segments, batch_size=len(segments), return_timestamps=True)
+    except Exception as e:
+        print(f"Batch transcription failed ({e}), retrying segments one by one")
+        outputs = None
+    finally:
+        segments.clear()
+        for shm in shms:
+            shm.close()
+
+    if outputs is None:
+        return [transcribe_shared_segment(item, model_id) for item in items]
+    return [_segment_result(item[0], output) for item, output in zip(items, outputs)]
+
+def score_shared_segments(items, model_id=MODEL_ID):
+    """Score draft transcripts of shared-memory segments with model_id.
+
+    items are (index, shm_name, offset, length, text); returns
+    (index, avg_logprob, no_speech_prob) tuples, with None scores when the
+    model cannot be scored.
+    """
+    p = get_asr_pipeline(model_id)
+    scores = []
+    for index, shm_name, offset, length, text in items:
+        try:
+            shm, segment = attach_shared_segment(shm_name, offset, length)
+        except Exception:
+            scores.append((index, None, None))
+            continue
+        try:
+            scores.append((index, *score_transcript(p, segment, text)))
+        except Exception as e:
+            # Same cause for every segment (e.g. an ONNX model); don't retry the rest
+            print(f"Scoring with {model_id} unavailable: {e}")
+            scores.extend((i, None, None) for i, *_ in items[len(scores):])
+            break
+        finally:
+            del segment
+            shm.close()
+    return scores
+
+def _run_segments(submit, segments, max_in_flight, progress=None, retries=None, on_result=None):
+    """Submit segments, keeping at most max_in_flight queued for this request.
+
+    A segment whose transcription fails, or whose batch is lost with a
+    broken pool, is resubmitted on its own up to retries times and then
+    returned as (index, None, None). progress(done, total) is called as
+    segments complete, after on_result(result) if given.
+    """
+    retries = ASR_SEGMENT_RETRIES if retries is None else retries
+    results = []
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            segment, attempt = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Segment {segment[0]} raised {type(e).__name__}: {e}")
+                result = (segment[0], None, None)
+            if result[1] is None and attempt < retries:
+                print(f"Retrying segment {segment[0]} ({attempt + 1}/{retries})")
+                pending[submit(segment)] = (segment, attempt + 1)
+                continue
+            results.append(result)
+            if on_result:
+                on_result(result)
+            if progress:
+                progress(len(results), len(segments))
+
+    for segment in segments:
+        pending[submit(segment)] = (segment, 0)
+        if len(pending) >= max_in_flight:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        collect(done)
+    return results
+
+def transcribe_audio_parallel(file_like, num_processes=None, segment_length=None, segmentation="fixed",
+                              progress=None, model_id=MODEL_ID, stats=None, overlap=None):
+    """Transcribe segments through the shared worker pool.
+
+    num_processes and segment_length are planned from the audio duration and
+    current load when omitted, and clamped when given. Fixed segments overlap
+    by overlap seconds (ASR_SEGMENT_OVERLAP by default) and are merged on
+    Whisper's timestamps. If stats is a dict it receives the plan that was
+    used and the number of segments that failed after retries.
+    """
+    overlap = ASR_SEGMENT_OVERLAP if overlap is None else overlap
+    if segmentation != "fixed":
+        overlap = 0
+    source_hash = hash_source(file_like)
+    cache_key = transcription_cache_key(source_hash, model_id, "parallel", segment_length or "auto", segmentation, overlap)
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        print("Transcription cache hit")
+        return cached
+
+    with _track_request():
+        request_start = time.time()
+        audio_data, sample_rate = load_audio(file_like, source_hash)
+        duration = len(audio_data) / sample_rate
+
+        plan = plan_transcription(duration, num_processes, segment_length)
+        if stats is not None:
+            stats.update(plan)
+        num_processes, segment_length = plan["num_processes"], plan["segment_length"]
+        print(f"Planned {num_processes} processes, {segment_length}s segments for {duration:.1f}s audio"
+              f" ({plan['active_requests']} active requests)")
+
+        if duration <= segment_length:
+            # One segment: transcribe the audio already decoded in a single pass
+            text = _transcribe_whole(audio_data, sample_rate, model_id, request_start)
+            if text.strip():
+                transcription_cache.set(cache_key, text)
+            return text
+
+        with timed("segmentation"):
+            offsets = segment_audio(audio_data, sample_rate, segment_length, segmentation, overlap)
+        if not offsets:
+            print("No speech detected")
+            return ""
+        speech_seconds = sum(length for _, _, length in offsets) / sample_rate
+        print(f"{len(offsets)} segments ({segmentation}), {speech_seconds:.1f}s of {duration:.1f}s audio")
+
+        # Segments are batched together with those of other in-flight requests.
+        # num_processes limits how many batches' worth of this request's segments
+        # are queued at once; the pool itself is sized by ASR_POOL_SIZE.
+        # Workers read their segment straight out of one shared buffer.
+        # Failed segments are retried on their own rather than redoing the file
+        start = time.time()
+        with shared_audio(audio_data) as shm_name:
+            segments = [
+                (index, shm_name, offset, length)
+                for index, offset, length in offsets
+            ]
+            with timed("inference"):
+                results = _run_segments(
+                    get_batch_scheduler(model_id).submit,
+                    segments,
+                    num_processes * ASR_MAX_BATCH_SIZE,
+                    progress
+                )
+        print(f"Parallel processing completed in {time.time() - start:.2f}s")
+
+        failed = [index for index, text, _ in results if text is None]
+        if failed:
+            print(f"{len(failed)} of {len(results)} segments failed after {ASR_SEGMENT_RETRIES} retries")
+        if stats is not None:
+            stats["overlap"] = overlap
+            stats["failed_segments"] = len(failed)
+
+        with timed("merge"):
+            bounds = {index: (offset, length) for index, offset, length in offsets}
+            text = merge_segments([
+                {
+                    "start": bounds[index][0] / sample_rate,
+                    "end": (bounds[index][0] + bounds[index][1]) / sample_rate,
+                    "text": text,
+                    "chunks": chunks
+                }
+                for index, text, chunks in results if text is not None
+            ])
 
-    if duration <= segment_length:
-        return transcribe_audio_sequential(file_like)
+        if text.strip() and not failed:
+            record_latency(model_id, time.time() - request_start, duration)
+            transcription_cache.set(cache_key, text)
+        return text
 
-    segments = split_audio(audio_data, sample_rate, segment_length)
+def iter_transcribe_stream(file_like, num_processes=None, segment_length=None, model_id=MODEL_ID, stats=None):
+    """Transcribe while decoding, yielding each segment as soon as it is done.
 
+    Frames come straight off the decoder into the batch scheduler, so the first
+    segment is being transcribed while the rest of the file is still decoding.
+    At most num_processes batches' worth of frames are held at once, which keeps
+    memory bounded regardless of file length. Segments are yielded in
+    completion order as dicts with index, start, end (seconds) and text.
+    Repeat requests for the same audio replay the cached segments.
+    The duration is unknown up front, so omitted values plan for long audio.
+    """
+    source_hash = hash_source(file_like)
+    cache_key = transcription_cache_key(source_hash, model_id, "stream", segment_length or "auto")
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        print("Transcription cache hit")
+        yield from cached
+        return
+
+    with _track_request():
+        plan = plan_transcription(None, num_processes, segment_length)
+        if stats is not None:
+            stats.update(plan)
+        segment_length = plan["segment_length"]
+
+        request_start = time.time()
+        scheduler = get_batch_scheduler(model_id)
+        max_in_flight = plan["num_processes"] * ASR_MAX_BATCH_SIZE
+        pending = {}
+        completed = []
+        failed = []
+
+        def finished(done):
+            for future in done:
+                shm, index, num_samples, attempt = pending.pop(future)
+                try:
+                    _, text, _ = future.result()
+                except Exception as e:
+                    print(f"Segment {index} raised {type(e).__name__}: {e}")
+                    text = None
+                if text is None and attempt < ASR_SEGMENT_RETRIES:
+                    # The frame stays in shared memory until its retry finishes
+                    print(f"Retrying segment {index} ({attempt + 1}/{ASR_SEGMENT_RETRIES})")
+                    retry = scheduler.submit((index, shm.name, 0, num_samples))
+                    pending[retry] = (shm, index, num_samples, attempt + 1)
+                    continue
+                release_shared_audio(shm)
+                if text is None:
+                    print(f"Segment {index} failed after {ASR_SEGMENT_RETRIES} retries")
+                    failed.append(index)
+                    text = ""
+                start = index * segment_length
+                segment = {
+                    "index": index,
+                    "start": round(start, 2),
+                    "end": round(start + num_samples / 16000, 2),
+                    "text": text
+                }
+                completed.append(segment)
+                yield segment
+
+        decoded = audio_cache.get(audio_cache_key(source_hash, "ffmpeg"))
+        writer = None
+        try:
+            if decoded is not None:
+                # Decoded before: slice frames straight out of the cached array
+                frame_samples = segment_length * 16000
+                frames = (decoded[start:start + frame_samples] for start in range(0, len(decoded), frame_samples))
+            else:
+                # Decode time is the time spent waiting on the decoder for frames;
+                # frames are also written to the audio cache as they arrive
+                writer = audio_cache.writer(audio_cache_key(source_hash, "ffmpeg"))
+                frames = timed_iter("decode", stream_audio_frames(file_like, frame_seconds=segment_length))
+            for index, frame in enumerate(frames):
+                if writer is not None:
+                    writer.append(frame)
+                shm = create_shared_audio(frame)
+                future = scheduler.submit((index, shm.name, 0, len(frame)))
+                pending[future] = (shm, index, len(frame), 0)
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from finished(done)
+            if writer is not None:
+                writer.commit()
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+
+            if completed:
+                record_latency(model_id, time.time() - request_start, max(s["end"] for s in completed))
+            if stats is not None:
+                stats["failed_segments"] = len(failed)
+            if any(s["text"].strip() for s in completed) and not failed:
+                transcription_cache.set(cache_key, sorted(completed, key=lambda s: s["index"]))
+        finally:
+            # Reached when the consumer stops early or a segment fails
+            if writer is not None:
+                writer.discard()
+            for shm, _, _, _ in pending.values():
+                release_shared_audio(shm)
+            pending.clear()
+
+def transcribe_audio_streaming(file_like, num_processes=None, segment_length=None, model_id=MODEL_ID, stats=None):
+    """Streaming counterpart of transcribe_audio_parallel; no temp file, bounded memory."""
     start = time.time()
-    with ProcessPoolExecutor(max_workers=num_processes) as executor:
-        results = executor.map(transcribe_segment, segments)
-    print(f"Parallel processing completed in {time.time() - start:.2f}s")
+    try:
+        segments = sorted(
+            iter_transcribe_stream(file_like, num_processes, segment_length, model_id, stats),
+            key=lambda s: s["index"]
+        )
+    except BrokenProcessPool:
+        print("ASR worker pool broke during transcription")
+        restart_worker_pool()
+        return ""
+    print(f"Streaming transcription completed in {time.time() - start:.2f}s")
+    return " ".join(s["text"] for s in segments if s["text"].strip())
+
+def transcribe_audio_draft(file_like, num_processes=None, segment_length=None, model_id=DRAFT_MODEL_ID, stats=None):
+    """First pass of two-tier transcription: a fast draft.
+
+    VAD segments are transcribed with model_id (whisper-tiny by default).
+    Returns the segments in order as dicts with index, start, end (seconds),
+    offset, length (samples), text, avg_logprob, no_speech_prob, scored and
+    refine: why the segment should go through refine_segments, or None.
+    The drafts are not scored yet, so refine only reflects failed, empty and
+    repeating segments; score_segments fills in the rest afterwards.
+    """
+    source_hash = hash_source(file_like)
+    cache_key = transcription_cache_key(source_hash, model_id, "draft", segment_length or "auto")
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        print("Transcription cache hit")
+        return cached
+
+    with _track_request():
+        request_start = time.time()
+        audio_data, sample_rate = load_audio(file_like, source_hash)
+        duration = len(audio_data) / sample_rate
+        plan = plan_transcription(duration, num_processes, segment_length)
+        if stats is not None:
+            stats.update(plan)
+        max_in_flight = plan["num_processes"] * ASR_MAX_BATCH_SIZE
+
+        # VAD segments never overlap, so a refined segment simply replaces its draft
+        with timed("segmentation"):
+            offsets = segment_audio(audio_data, sample_rate, plan["segment_length"], "vad")
+        if not offsets:
+            print("No speech detected")
+            return []
+
+        with shared_audio(audio_data) as shm_name:
+            items = [(index, shm_name, offset, length) for index, offset, length in offsets]
+            with timed("inference"):
+                results = _run_segments(get_batch_scheduler(model_id).submit, items, max_in_flight)
+        texts = {index: text for index, text, _ in results}
+
+        segments = []
+        for index, offset, length in offsets:
+            text = texts[index]
+            segments.append({
+                "index": int(index),
+                "start": round(offset / sample_rate, 2),
+                "end": round((offset + length) / sample_rate, 2),
+                "offset": int(offset),
+                "length": int(length),
+                "text": text or "",
+                "avg_logprob": None,
+                "no_speech_prob": None,
+                "scored": False,
+                # Segments the draft model failed on go straight to the larger model
+                "refine": "failed" if text is None else refine_reason(text)
+            })
+
+        failed = sum(1 for s in segments if s["refine"] == "failed")
+        if stats is not None:
+            stats["failed_segments"] = failed
+        if not failed:
+            record_latency(model_id, time.time() - request_start, duration)
+            if any(s["text"].strip() for s in segments):
+                transcription_cache.set(cache_key, segments)
+        return segments
 
-    results = sorted(results, key=lambda x: x[0])
-    text = " ".join(r[1] for r in results if r[1].strip())
+def score_segments(file_like, segments, model_id=DRAFT_MODEL_ID, source_hash=None):
+    """Score draft segments with Whisper's avg_logprob and no_speech_prob and update their refine reason.
 
-    return text if text.strip() else transcribe_audio_sequential(file_like)
+    model_id must be the model that wrote the drafts. Scoring runs on the
+    pool, a batch's worth of segments per task; segments already scored or
+    that failed to draft are returned unchanged.
+    """
+    todo = [s for s in segments if not s.get("scored") and s["refine"] != "failed"]
+    scores = {}
+    if todo:
+        audio_data, _ = load_audio(file_like, source_hash)
+        with shared_audio(audio_data) as shm_name:
+            items = [(s["index"], shm_name, s["offset"], s["length"], s["text"]) for s in todo]
+            with timed("scoring"):
+                futures = [
+                    get_worker_pool().submit(score_shared_segments, items[i:i + ASR_MAX_BATCH_SIZE], model_id)
+                    for i in range(0, len(items), ASR_MAX_BATCH_SIZE)
+                ]
+                for future in futures:
+                    try:
+                        scores.update((index, (logprob, no_speech)) for index, logprob, no_speech in future.result())
+                    except Exception as e:
+                        print(f"Draft scoring failed: {e}")
+
+    scored = []
+    for s in segments:
+        if s["index"] not in scores:
+            scored.append(s)
+            continue
+        avg_logprob, no_speech_prob = scores[s["index"]]
+        scored.append(dict(
+            s,
+            avg_logprob=None if avg_logprob is None else round(avg_logprob, 3),
+            no_speech_prob=None if no_speech_prob is None else round(no_speech_prob, 3),
+            scored=True,
+            refine=refine_reason(s["text"], avg_logprob, no_speech_prob)
+        ))
+    return scored
+
+def refine_segments(file_like, segments, model_id=REFINE_MODEL_ID, num_processes=None, source_hash=None,
+                    progress=None):
+    """Second pass of two-tier transcription: re-transcribe the unsure draft segments with model_id.
+
+    Only segments with a refine reason are run, each copied into its own
+    shared memory block so the rest of the audio is never shared; the
+    decoded audio normally comes from the audio cache the draft filled.
+    progress(done, total, refined) is called as segments finish, refined
+    being the [{"index", "text"}] done so far. Returns the segments with
+    refined set, and for those the larger model's text in place of the
+    draft, which is kept as draft_text.
+    """
+    todo = [s for s in segments if s["refine"]]
+    refined = {}
+    if todo:
+        with _track_request():
+            request_start = time.time()
+            audio_data, sample_rate = load_audio(file_like, source_hash)
+            seconds = sum(s["length"] for s in todo) / sample_rate
+            plan = plan_transcription(seconds, num_processes)
+
+            def record(result):
+                index, text, _ = result
+                if text is not None:
+                    refined[index] = text
+
+            def report(done, total):
+                if progress:
+                    progress(done, total, [{"index": i, "text": t} for i, t in sorted(refined.items())])
+
+            blocks = {}
+            try:
+                for s in todo:
+                    blocks[s["index"]] = create_shared_audio(audio_data[s["offset"]:s["offset"] + s["length"]])
+                items = [(s["index"], blocks[s["index"]].name, 0, s["length"]) for s in todo]
+                with timed("refine"):
+                    _run_segments(get_batch_scheduler(model_id).submit, items,
+                                  plan["num_processes"] * ASR_MAX_BATCH_SIZE, report, on_result=record)
+            finally:
+                for shm in blocks.values():
+                    release_shared_audio(shm)
+            print(f"Refined {len(refined)} of {len(todo)} draft segments with {model_id}")
+            if len(refined) == len(todo):
+                record_latency(model_id, time.time() - request_start, seconds)
+
+    return [
+        dict(s, text=refined[s["index"]], draft_text=s["text"], refined=True) if s["index"] in refined
+        else dict(s, refined=False)
+        for s in segments
+    ]
+
+def segments_text(segments):
+    """Transcript of segments in index order."""
+    ordered = sorted(segments, key=lambda s: s["index"])
+    return " ".join(s["text"].strip() for s in ordered if s["text"].strip())
+
+def transcribe_within_budget(file_like, streaming=False, num_processes=None, segment_length=None,
+                             segmentation="vad", progress=None, model_id=MODEL_ID, stats=None, overlap=None):
+    """transcribe_audio_parallel, or _streaming when asked or when memory requires it.
+
+    Memory for the request is reserved first and any downgrade plan_memory
+    picks is applied; stats additionally receives the model, streaming and
+    downgrades actually used. Raises MemoryBudgetExceeded when even the
+    cheapest way of running the request does not fit.
+    """
+    num_bytes = memory_governor.source_size(file_like)
+    seconds = None if streaming else memory_governor.audio_seconds(file_like, num_bytes)
+    with reserve_transcription(num_bytes, model_id, streaming, num_processes, seconds) as fit:
+        if stats is not None:
+            stats.update(model=fit["model_id"], streaming=fit["streaming"], downgrades=fit["downgrades"])
+        if fit["streaming"]:
+            return transcribe_audio_streaming(file_like, fit["num_processes"], segment_length, fit["model_id"], stats)
+        return transcribe_audio_parallel(file_like, fit["num_processes"], segment_length, segmentation,
+                                         progress, fit["model_id"], stats, overlap)
 
 def get_model_info():
     return {
         "model_id": MODEL_ID,
+        "backend": ASR_BACKEND,
+        "pool_size": ASR_POOL_SIZE,
         "model_type": "whisper",
         "pipeline_type": "automatic-speech-recognition"
     }
 
 def get_available_asr_models():
+    return list(ASR_MODELS)
+
+def _collect_metrics():
+    schedulers = {model_id: scheduler.stats() for model_id, scheduler in list(_schedulers.items())}
+    busy = sum(stats["in_flight"] for stats in schedulers.values())
     return [
-        "openai/whisper-tiny",
-        "openai/whisper-small",
-        "openai/whisper-medium",
-        "openai/whisper-large"
-    ]
+        ("cognivue_asr_pool_workers", "gauge", "ASR worker processes", [({}, ASR_POOL_SIZE)]),
+        ("cognivue_asr_pool_utilization", "gauge", "Share of ASR workers running a batch",
+         [({}, round(busy / ASR_POOL_SIZE, 3))]),
+        ("cognivue_asr_active_requests", "gauge", "Transcriptions in progress", [({}, _active_requests)]),
+        ("cognivue_asr_batch_queue_depth", "gauge", "Segments waiting to be batched",
+         [({"model": m}, s["queued"]) for m, s in schedulers.items()]),
+        ("cognivue_asr_batches_total", "counter", "Segment batches dispatched",
+         [({"model": m}, s["batches_run"]) for m, s in schedulers.items()]),
+        ("cognivue_asr_segments_total", "counter", "Segments dispatched",
+         [({"model": m}, s["items_run"]) for m, s in schedulers.items()])
+    ] + cache_metrics(transcription_cache) + cache_metrics(audio_cache)
+
+register_collector(_collect_metrics)
 
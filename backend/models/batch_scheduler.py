@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchScheduler:
+    """Collects work items from concurrent requests into batches.
+
+    A batch is dispatched once it holds max_batch_size items or the oldest
+    item has waited max_wait_ms. run_batch(items) must return a Future that
+    resolves to one result per item, in order; each caller gets back the
+    result for its own item.
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=20, max_in_flight=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(max(1, max_in_flight))
+        self._stats_lock = threading.Lock()
+        self.batches_run = 0
+        self.items_run = 0
+        self.in_flight = 0
+        self._thread = threading.Thread(target=self._loop, name="batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "batches_run": self.batches_run,
+                "items_run": self.items_run,
+                "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0,
+                "queued": self._queue.qsize(),
+                "in_flight": self.in_flight,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": int(self.max_wait * 1000)
+            }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            # Wait for a free slot first so that items keep accumulating into
+            # bigger batches while every worker is busy
+            self._slots.acquire()
+            batch = self._collect()
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            with self._stats_lock:
+                self.batches_run += 1
+                self.items_run += len(batch)
+                self.in_flight += 1
+
+            try:
+                batch_future = self.run_batch([item for item, _ in batch])
+            except Exception as e:
+                self._release()
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            batch_future.add_done_callback(lambda f, batch=batch: self._finish(f, batch))
+
+    def _release(self):
+        with self._stats_lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _finish(self, batch_future, batch):
+        self._release()
+        try:
+            results = batch_future.result()
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
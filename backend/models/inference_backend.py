@@ -0,0 +1,117 @@
+import os
+import time
+import shutil
+from contextlib import contextmanager
+from utils.result_cache import CACHE_DIR
+
+# pytorch: default fp32 weights
+# int8:    torch dynamic int8 quantization of the Linear layers
+# onnx:    exported ONNX Runtime graph (needs optimum[onnxruntime])
+BACKENDS = ("pytorch", "int8", "onnx")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+
+# ONNX Runtime model class for each pipeline task
+ORT_MODEL_CLASSES = {
+    "automatic-speech-recognition": "ORTModelForSpeechSeq2Seq",
+    "summarization": "ORTModelForSeq2SeqLM"
+}
+
+
+# Models are exported to ONNX once and loaded from here afterwards
+ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", os.path.join(CACHE_DIR, "onnx"))
+# Longest an export may hold the lock before it is presumed dead
+ONNX_EXPORT_TIMEOUT = float(os.getenv("ONNX_EXPORT_TIMEOUT", "1800"))
+
+
+def resolve_backend(backend=None):
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}. Available: {', '.join(BACKENDS)}")
+    return backend
+
+
+def build_pipeline(task, model_id, token=None, backend=None):
+    """Build a transformers pipeline on the requested CPU inference backend.
+
+    Falls back to plain PyTorch, with a warning, if the backend's optional
+    dependencies are missing.
+    """
+    from transformers import pipeline
+    backend = resolve_backend(backend)
+
+    if backend == "onnx":
+        try:
+            return _build_onnx_pipeline(task, model_id, token)
+        except ImportError as e:
+            print(f"ONNX Runtime backend unavailable ({e}), using pytorch for {model_id}")
+            backend = "pytorch"
+
+    pipe = pipeline(task, model=model_id, token=token)
+    if backend == "int8":
+        import torch
+        pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+@contextmanager
+def _file_lock(path, timeout=ONNX_EXPORT_TIMEOUT):
+    """Hold an exclusive lock across processes, taken by creating path.
+
+    A lock file older than timeout was left behind by a process that died
+    mid-export and is broken.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > timeout:
+                    os.unlink(path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {path}")
+            time.sleep(0.5)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try: os.unlink(path)
+        except OSError: pass
+
+
+def _onnx_model_dir(model_class, model_id, token):
+    """Directory holding model_id exported to ONNX, exporting it on first use.
+
+    Only one process exports; pool workers starting at the same time wait
+    for it and then load the saved copy.
+    """
+    directory = os.path.join(ONNX_CACHE_DIR, *model_id.split("/"))
+    if os.path.isdir(directory):
+        return directory
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    with _file_lock(directory + ".lock"):
+        if not os.path.isdir(directory):
+            print(f"Exporting {model_id} to ONNX")
+            tmp_directory = f"{directory}.{os.getpid()}.tmp"
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+            model_class.from_pretrained(model_id, export=True, token=token).save_pretrained(tmp_directory)
+            # The directory only appears once the export is complete
+            os.replace(tmp_directory, directory)
+    return directory
+
+
+def _build_onnx_pipeline(task, model_id, token):
+    import optimum.onnxruntime
+    from transformers import pipeline, AutoTokenizer, AutoFeatureExtractor
+
+    model_class = getattr(optimum.onnxruntime, ORT_MODEL_CLASSES[task])
+    model = model_class.from_pretrained(_onnx_model_dir(model_class, model_id, token))
+    tokenizer = AutoTokenizer.from_pretrained(model_id, token=token)
+    if task == "automatic-speech-recognition":
+        feature_extractor = AutoFeatureExtractor.from_pretrained(model_id, token=token)
+        return pipeline(task, model=model, tokenizer=tokenizer, feature_extractor=feature_extractor)
+    return pipeline(task, model=model, tokenizer=tokenizer)
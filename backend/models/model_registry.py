@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+from utils.metrics import observe
+from utils.memory_governor import register_usage
+
+# Approximate RAM the loaded models of one process may use; least recently
+# used models are evicted to make room for a new one
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "4096"))
+
+# Latency samples kept per model for percentiles
+LATENCY_WINDOW = 200
+
+# Loaded models are created on first use, once per process
+_loaders = {}
+_sizes_mb = {}
+_models = OrderedDict()
+_load_seconds = {}
+_latencies = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def register_model(name, loader, size_mb=0):
+    """Register a zero-argument loader; nothing is loaded until get_model(name).
+
+    size_mb is the approximate resident size once loaded, used for the
+    memory budget.
+    """
+    with _registry_lock:
+        _loaders[name] = loader
+        _sizes_mb[name] = size_mb
+        _locks.setdefault(name, threading.Lock())
+
+
+def get_model(name):
+    """Return the model, loading it on first use. Concurrent callers wait for one load."""
+    with _registry_lock:
+        if name in _models:
+            _models.move_to_end(name)
+            return _models[name]
+        if name not in _loaders:
+            raise KeyError(f"Unknown model: {name}")
+        lock = _locks[name]
+
+    with lock:
+        if name not in _models:
+            _make_room(name)
+            print(f"Loading model {name}...")
+            start = time.time()
+            model = _loaders[name]()
+            _load_seconds[name] = round(time.time() - start, 2)
+            observe("model_load", time.time() - start)
+            with _registry_lock:
+                _models[name] = model
+            print(f"Loaded model {name} in {_load_seconds[name]:.2f}s")
+        return _models[name]
+
+
+def _make_room(name):
+    """Evict least recently used models until name fits in the memory budget.
+
+    A model larger than the whole budget is loaded over budget with a
+    warning; evicting the others would not make it fit.
+    """
+    with _registry_lock:
+        size_mb = _sizes_mb.get(name, 0)
+        if size_mb > MODEL_MEMORY_BUDGET_MB:
+            print(f"Warning: model {name} needs {size_mb} MB, more than the {MODEL_MEMORY_BUDGET_MB} MB budget; "
+                  f"loading it over budget")
+            return
+        while _models and loaded_size_mb() + _sizes_mb.get(name, 0) > MODEL_MEMORY_BUDGET_MB:
+            evicted, _ = _models.popitem(last=False)
+            print(f"Evicting model {evicted} to stay within {MODEL_MEMORY_BUDGET_MB} MB")
+
+
+def loaded_size_mb():
+    return sum(_sizes_mb.get(name, 0) for name in list(_models))
+
+
+register_usage(loaded_size_mb)
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def unload_model(name):
+    with _registry_lock:
+        _models.pop(name, None)
+
+
+def record_latency(name, seconds, audio_seconds=None):
+    """Record one request's latency; audio_seconds enables a real-time factor."""
+    with _registry_lock:
+        samples = _latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW))
+        samples.append((seconds, audio_seconds))
+
+
+def latency_stats(name):
+    with _registry_lock:
+        samples = list(_latencies.get(name, ()))
+    if not samples:
+        return {"requests": 0}
+    seconds = np.array([s for s, _ in samples])
+    audio = [(s, a) for s, a in samples if a]
+    stats = {
+        "requests": len(samples),
+        "avg_seconds": round(float(seconds.mean()), 3),
+        "p50_seconds": round(float(np.percentile(seconds, 50)), 3),
+        "p95_seconds": round(float(np.percentile(seconds, 95)), 3)
+    }
+    if audio:
+        stats["real_time_factor"] = round(sum(s for s, _ in audio) / sum(a for _, a in audio), 3)
+    return stats
+
+
+def model_status(names=None):
+    names = list(_loaders) if names is None else names
+    return {
+        name: {
+            "loaded": name in _models,
+            "size_mb": _sizes_mb.get(name),
+            "load_seconds": _load_seconds.get(name),
+            "latency": latency_stats(name)
+        }
+        for name in names
+    }
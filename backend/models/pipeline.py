@@ -0,0 +1,98 @@
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from models.asr_model import iter_transcribe_stream, MODEL_ID as ASR_MODEL_ID
+from models.summarizer_model import TextChunker, summarize_with_bart, reduce_summaries, is_summary_error
+from utils.metrics import timed
+
+
+def _summarize_chunk(chunk, max_length, min_length):
+    with timed("summarize_map"):
+        return summarize_with_bart(chunk, max_length, min_length)
+
+
+def iter_transcribe_and_summarize(file_like, max_length=130, min_length=30, num_processes=None,
+                                  segment_length=None, model_id=ASR_MODEL_ID, stats=None):
+    """Transcribe and summarize in one pass, overlapping the two stages.
+
+    Audio is transcribed with iter_transcribe_stream. Finished segments are
+    put back in order and fed to a TextChunker, and each chunk it completes
+    is summarized on a background thread while later audio is still being
+    transcribed. Only the final reduce waits for the whole transcript, so
+    for long recordings the total time approaches the slower of the two
+    stages rather than their sum.
+
+    Yields (event, data) pairs: ("segment", segment) as segments finish,
+    ("chunk_summary", {"index", "summary"}) as map summaries finish, then
+    ("done", result) where result holds the transcription and summary
+    (None when nothing was transcribed or summarization failed).
+    """
+    stats = {} if stats is None else stats
+    start_time = time.time()
+    chunker = TextChunker()
+    transcript = []
+    ready = {}
+    next_index = 0
+    map_futures = []
+    reported = 0
+
+    def finished_summaries():
+        # Map summaries are reported in chunk order as soon as they are done
+        nonlocal reported
+        while reported < len(map_futures) and map_futures[reported].done():
+            yield "chunk_summary", {"index": reported, "summary": map_futures[reported].result()}
+            reported += 1
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-map") as mapper:
+
+        def submit(chunks):
+            for chunk in chunks:
+                # Copy the context so the map stages land in the request's trace
+                context = contextvars.copy_context()
+                map_futures.append(mapper.submit(context.run, _summarize_chunk, chunk, max_length, min_length))
+
+        try:
+            for segment in iter_transcribe_stream(file_like, num_processes, segment_length, model_id, stats):
+                yield "segment", segment
+                ready[segment["index"]] = segment["text"].strip()
+                while next_index in ready:
+                    text = ready.pop(next_index)
+                    next_index += 1
+                    if text:
+                        transcript.append(text)
+                        submit(chunker.add(text))
+                yield from finished_summaries()
+
+            submit(chunker.finish())
+            stats["transcription_seconds"] = round(time.time() - start_time, 2)
+            stats["chunks"] = len(map_futures)
+            stats["chunks_summarized_during_transcription"] = sum(f.done() for f in map_futures)
+
+            for future in map_futures[reported:]:
+                future.result()
+                yield from finished_summaries()
+        finally:
+            # Reached early when the client goes away; skip chunks not yet started
+            for future in map_futures:
+                future.cancel()
+
+    transcription = " ".join(transcript)
+    summaries = [f.result() for f in map_futures if not is_summary_error(f.result())]
+    summary = None
+    reduce_start = time.time()
+    if len(map_futures) == 1 and summaries:
+        # The whole transcript fit in one chunk, so its summary is the final one
+        stats["depth"] = 1
+        summary = summaries[0]
+    elif summaries:
+        summary = reduce_summaries(summaries, max_length, min_length, stats)
+        if is_summary_error(summary):
+            summary = None
+    stats["reduce_seconds"] = round(time.time() - reduce_start, 2)
+
+    yield "done", {
+        "transcription": transcription,
+        "summary": summary,
+        "num_chunks": len(map_futures),
+        "failed_chunks": len(map_futures) - len(summaries)
+    }
@@ -1,56 +1,234 @@
 import os
-from transformers import pipeline
+import re
+import time
+import numpy as np
 from dotenv import load_dotenv
-from concurrent.futures import ThreadPoolExecutor
+from models.model_registry import register_model, get_model, record_latency
+from models.inference_backend import build_pipeline, resolve_backend, INFERENCE_BACKEND
+from utils.result_cache import ResultCache, make_key
+from utils.metrics import timed, register_collector, cache_metrics
+from utils.extractive import sentence_scores, select_sentences, EXTRACTIVE_METHODS
+from utils import memory_governor
 
 load_dotenv()
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 MODEL_ID = "facebook/bart-large-cnn"
 
-summarizer = pipeline(
-    "summarization",
-    model = MODEL_ID,
-    token = HF_TOKEN
+# pytorch, int8 or onnx; see models/inference_backend.py
+SUMMARIZER_BACKEND = resolve_backend(os.getenv("SUMMARIZER_BACKEND", INFERENCE_BACKEND))
+
+# How many summaries are merged into one input at each reduce level
+SUMMARY_REDUCE_FAN_IN = int(os.getenv("SUMMARY_REDUCE_FAN_IN", "8"))
+# Reduce levels allowed before giving up on fitting the final pass
+SUMMARY_MAX_REDUCE_DEPTH = int(os.getenv("SUMMARY_MAX_REDUCE_DEPTH", "6"))
+
+# Batched generation: at most SUMMARY_BATCH_SIZE chunks per batch and at most
+# SUMMARY_BATCH_TOKENS tokens once every chunk is padded to the longest one
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", "4"))
+SUMMARY_BATCH_TOKENS = int(os.getenv("SUMMARY_BATCH_TOKENS", "4096"))
+
+# Memory per character of input while summarizing: the text, its token
+# offsets and the chunks cut from it
+SUMMARY_BYTES_PER_CHAR = int(os.getenv("SUMMARY_BYTES_PER_CHAR", "40"))
+
+# Default token budget of the extractive pre-filter, in model passes: 1 keeps
+# as many salient sentences as fit in a single summarization call
+EXTRACTIVE_PASSES = float(os.getenv("EXTRACTIVE_PASSES", "1"))
+
+def create_summarizer(backend=None):
+    return build_pipeline(
+        "summarization",
+        MODEL_ID,
+        token = HF_TOKEN,
+        backend = backend or SUMMARIZER_BACKEND
+    )
+
+# Loaded lazily on first use so importing this module stays cheap
+register_model(MODEL_ID, create_summarizer, size_mb=700 if SUMMARIZER_BACKEND == "int8" else 1700)
+
+def get_available_summarizers():
+    return [MODEL_ID]
+
+def get_summarizer():
+    return get_model(MODEL_ID)
+
+# Messages summarize_text returns instead of a summary when something fails
+SUMMARY_ERROR_PREFIXES = (
+    "Failed to", "GPU/", "Insufficient", "Token limit", "Summarization model", "Unexpected error"
 )
 
-def split_text_into_chunks(text, chunk_size=3000, overlap=500):
-    """Split text into overlapping chunks"""
+# Summaries keyed by text hash, model and length limits
+summary_cache = ResultCache("summaries")
+register_collector(lambda: cache_metrics(summary_cache))
+
+def reserve_summary(text):
+    """Hold the memory summarizing text needs; raises MemoryBudgetExceeded if it does not fit."""
+    return memory_governor.reserve(len(text) * SUMMARY_BYTES_PER_CHAR / (1024 * 1024), "summarization")
+
+def is_summary_error(summary):
+    return not summary or summary.startswith(SUMMARY_ERROR_PREFIXES)
+
+# Sentence ends: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+')
+
+def max_input_tokens():
+    """Tokens of content that fit in one model pass, excluding special tokens."""
+    summarizer = get_summarizer()
+    tokenizer = summarizer.tokenizer
+    limit = getattr(summarizer.model.config, "max_position_embeddings", None) or tokenizer.model_max_length
+    limit = min(limit, tokenizer.model_max_length)
+    return limit - tokenizer.num_special_tokens_to_add()
+
+def tokenize_with_offsets(text):
+    """Tokenize the whole document once; returns each token's start character."""
+    encoding = get_summarizer().tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    return np.array([start for start, _ in encoding["offset_mapping"]], dtype=np.int64)
+
+def split_text_into_chunks(text, max_tokens=None):
+    """Split text into chunks of whole sentences, each close to max_tokens tokens.
+
+    The document is tokenized once and sentence boundaries are mapped onto the
+    token offsets, so chunks are packed by real token counts rather than
+    characters and nothing past the model limit gets truncated. Sentences
+    longer than max_tokens are split at token boundaries.
+    """
+    max_tokens = max_tokens or max_input_tokens()
+    token_starts = tokenize_with_offsets(text)
+    if len(token_starts) <= max_tokens:
+        return [text.strip()] if text.strip() else []
+
+    boundaries = np.array([0] + [m.end() for m in SENTENCE_END.finditer(text)] + [len(text)])
+    # Token index where each sentence starts; sentence token counts are the gaps
+    sentence_tokens = np.searchsorted(token_starts, boundaries)
+
     chunks = []
-    start = 0
-    
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        
-        # Move start position with overlap
-        start = end - overlap
-        if start >= len(text):
-            break
-    
+    chunk_start = 0  # token index
+
+    def emit(start_token, end_token):
+        start_char = token_starts[start_token]
+        end_char = token_starts[end_token] if end_token < len(token_starts) else len(text)
+        chunk = text[start_char:end_char].strip()
+        if chunk:
+            chunks.append(chunk)
+
+    previous_end = 0
+    for end_token in sentence_tokens[1:]:
+        if end_token - chunk_start > max_tokens:
+            # This sentence no longer fits: close the chunk at the previous sentence end
+            if previous_end > chunk_start:
+                emit(chunk_start, previous_end)
+                chunk_start = previous_end
+            while end_token - chunk_start > max_tokens:
+                emit(chunk_start, chunk_start + max_tokens)
+                chunk_start += max_tokens
+        previous_end = end_token
+
+    if chunk_start < len(token_starts):
+        emit(chunk_start, len(token_starts))
     return chunks
 
-def summarize_chunks_parallel(chunks, max_length, min_length):
-    """Summarize multiple chunks in parallel"""
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        futures = []
-        for chunk in chunks:
-            future = executor.submit(summarize_with_bart, chunk, max_length, min_length)
-            futures.append(future)
-        
-        summaries = []
-        for future in futures:
-            summary = future.result()
-            if summary:
-                summaries.append(summary)
-    
-    return summaries
+def extract_salient(text, method, max_tokens=None, stats=None):
+    """Keep the most salient sentences of text that together fit in max_tokens.
+
+    Sentences are scored with TF-IDF or TextRank (see utils/extractive.py)
+    and the best ones are kept in their original order, so a long transcript
+    goes through one or two model passes instead of dozens. Text that
+    already fits is returned unchanged.
+    """
+    max_tokens = max_tokens or int(max_input_tokens() * EXTRACTIVE_PASSES)
+    token_starts = tokenize_with_offsets(text)
+    if len(token_starts) <= max_tokens:
+        return text
+
+    boundaries = np.array([0] + [m.end() for m in SENTENCE_END.finditer(text)] + [len(text)])
+    sentences = [text[start:end].strip() for start, end in zip(boundaries[:-1], boundaries[1:])]
+    token_counts = np.diff(np.searchsorted(token_starts, boundaries))
+    # Only the first copy of a repeated sentence is a candidate
+    first_seen = {}
+    for i, sentence in enumerate(sentences):
+        if sentence:
+            first_seen.setdefault(sentence.lower(), i)
+    candidates = np.array(sorted(first_seen.values()), dtype=np.int64)
+    scores = sentence_scores([sentences[i] for i in candidates], method)
+    kept = [int(candidates[i]) for i in select_sentences(scores, token_counts[candidates], max_tokens)]
+    if not kept:
+        # Every sentence is longer than the budget; leave it to the chunker
+        return text
+
+    extracted = " ".join(sentences[i] for i in kept)
+    if stats is not None:
+        stats["extractive"] = {
+            "method": method,
+            "sentences": len(sentences),
+            "sentences_kept": len(kept),
+            "input_tokens": len(token_starts),
+            "kept_tokens": int(token_counts[kept].sum())
+        }
+    print(f"Extractive {method}: kept {len(kept)} of {len(sentences)} sentences")
+    return extracted
+
+def make_batches(lengths, batch_size, batch_tokens):
+    """Group chunk indices into batches sorted by length to minimise padding.
+
+    A batch is closed when it reaches batch_size chunks or when padding every
+    chunk to the longest one would exceed batch_tokens.
+    """
+    batches = []
+    current = []
+    for index in np.argsort(lengths, kind="stable"):
+        padded = lengths[index] * (len(current) + 1)
+        if current and (len(current) >= batch_size or padded > batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(int(index))
+    if current:
+        batches.append(current)
+    return batches
+
+def summarize_chunks_batched(chunks, max_length, min_length, batch_size=None, stats=None):
+    """Summarize chunks with batched generation; results keep the input order.
+
+    If a stats dict is passed, batch count and measured throughput are added.
+    """
+    if not chunks:
+        return []
+    batch_size = max(1, batch_size or SUMMARY_BATCH_SIZE)
+    summarizer = get_summarizer()
+    lengths = np.array([len(ids) for ids in summarizer.tokenizer(chunks, truncation=True)["input_ids"]])
+    batches = make_batches(lengths, batch_size, max(SUMMARY_BATCH_TOKENS, int(lengths.max())))
+
+    start = time.time()
+    summaries = [None] * len(chunks)
+    for batch in batches:
+        texts = [chunks[i] for i in batch]
+        try:
+            outputs = summarizer(
+                texts,
+                max_length=max_length,
+                min_length=min_length,
+                truncation=True,
+                batch_size=len(texts)
+            )
+            for i, output in zip(batch, outputs):
+                summaries[i] = output["summary_text"]
+        except Exception as e:
+            print(f"Batched summarization failed ({e}), retrying chunks one by one")
+            for i in batch:
+                summaries[i] = summarize_with_bart(chunks[i], max_length, min_length)
+    elapsed = time.time() - start
+
+    if stats is not None:
+        stats["batches"] = len(batches)
+        stats["input_tokens"] = int(lengths.sum())
+        stats["chunks_per_second"] = round(len(chunks) / elapsed, 2) if elapsed else None
+        stats["tokens_per_second"] = round(float(lengths.sum()) / elapsed, 1) if elapsed else None
+    return [summary for summary in summaries if summary]
 
 def summarize_with_bart(text, max_length, min_length):
     """Summarize using BART model"""
     try:
-        summary = summarizer(
+        summary = get_summarizer()(
             text,
             max_length=max_length,
             min_length=min_length,
@@ -70,38 +248,181 @@ def summarize_with_bart(text, max_length, min_length):
         else:
             return f"Summarization model error: {e}"
 
-def summarize_text(text, max_length, min_length):
+def summarize_text(text, max_length, min_length, stats=None, batch_size=None, extractive=None, extractive_tokens=None):
+    """Summarize text of any length.
+
+    extractive ("tfidf" or "textrank") first shrinks long text to its most
+    salient sentences, up to extractive_tokens tokens. If a stats dict is
+    passed it is filled with the reduce depth and per-level timings and
+    throughput.
+    """
     if not text or not text.strip():
         return "No text provided for summarization"
-    
+    if extractive is not None and extractive not in EXTRACTIVE_METHODS:
+        raise ValueError(f"Unknown extractive method '{extractive}'. Available: {', '.join(EXTRACTIVE_METHODS)}")
+
+    stats = {} if stats is None else stats
+    key_parts = [make_key(text), MODEL_ID, SUMMARIZER_BACKEND, max_length, min_length]
+    if extractive:
+        key_parts += [extractive, extractive_tokens]
+    cache_key = make_key(*key_parts)
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        print("Summary cache hit")
+        stats["cached"] = True
+        return cached
+
+    start = time.time()
+    summary = _summarize_text(text, max_length, min_length, stats, batch_size, extractive, extractive_tokens)
+    if not is_summary_error(summary):
+        record_latency(MODEL_ID, time.time() - start)
+        summary_cache.set(cache_key, summary)
+    return summary
+
+def group_summaries(summaries, fan_in, max_tokens):
+    """Pack consecutive summaries into groups of at most fan_in that fit in one model pass."""
+    groups = []
+    current, current_tokens = [], 0
+    for summary in summaries:
+        tokens = len(tokenize_with_offsets(summary)) + 1
+        if current and (len(current) >= fan_in or current_tokens + tokens > max_tokens):
+            groups.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(summary)
+        current_tokens += tokens
+    if current:
+        groups.append(" ".join(current))
+    return groups
+
+def summarize_level(inputs, max_length, min_length, level, stats, batch_size=None):
+    """Summarize one level of the tree in batches and record its timing."""
+    start = time.time()
+    level_stats = {"level": level, "inputs": len(inputs)}
+    summaries = [
+        s for s in summarize_chunks_batched(inputs, max_length, min_length, batch_size, level_stats)
+        if not is_summary_error(s)
+    ]
+    level_stats["outputs"] = len(summaries)
+    level_stats["seconds"] = round(time.time() - start, 2)
+    stats.setdefault("levels", []).append(level_stats)
+    print(f"Level {level}: {len(inputs)} inputs -> {len(summaries)} summaries in {time.time() - start:.2f}s")
+    return summaries
+
+def reduce_summaries(summaries, max_length, min_length, stats, batch_size=None):
+    """Reduce chunk summaries level by level into one final summary.
+
+    Summaries are grouped SUMMARY_REDUCE_FAN_IN at a time and summarized
+    again until everything fits in a single final pass, so the final pass
+    never truncates. Fails after SUMMARY_MAX_REDUCE_DEPTH levels or when a
+    level stops shortening the summaries.
+    """
+    max_tokens = max_input_tokens()
+    fan_in = max(2, SUMMARY_REDUCE_FAN_IN)
+
+    level = 1
+    total_tokens = len(tokenize_with_offsets(" ".join(summaries)))
+    while total_tokens > max_tokens:
+        if level > SUMMARY_MAX_REDUCE_DEPTH:
+            print(f"Summaries still {total_tokens} tokens after {level - 1} reduce levels")
+            return f"Failed to summarize chunks - still over {max_tokens} tokens after {level - 1} reduce levels"
+        groups = group_summaries(summaries, fan_in, max_tokens)
+        level_max_length, level_min_length = max_length, min_length
+        if len(groups) >= len(summaries):
+            # No two summaries fit in one pass; shorten each so pairs fit at the next level
+            level_max_length = min(max_length, max_tokens // 2 - 1)
+            level_min_length = min(min_length, level_max_length // 2)
+        with timed("summarize_reduce"):
+            reduced = summarize_level(groups, level_max_length, level_min_length, level, stats, batch_size)
+        if not reduced:
+            return f"Failed to summarize chunks - reduce level {level} failed"
+        reduced_tokens = len(tokenize_with_offsets(" ".join(reduced)))
+        if reduced_tokens >= total_tokens:
+            print(f"Reduce level {level} did not shorten the summaries ({total_tokens} -> {reduced_tokens} tokens)")
+            return f"Failed to summarize chunks - reduce level {level} did not shorten the summaries"
+        summaries, total_tokens = reduced, reduced_tokens
+        level += 1
+
+    combined_summaries = " ".join(summaries)
+    print(f"Combined summaries length: {len(combined_summaries)} chars")
+
+    start = time.time()
+    with timed("summarize_reduce"):
+        final_summary = summarize_with_bart(combined_summaries, max_length, min_length)
+    stats.setdefault("levels", []).append({
+        "level": level,
+        "inputs": 1,
+        "outputs": 1,
+        "seconds": round(time.time() - start, 2)
+    })
+    stats["depth"] = level + 1
+    if final_summary is None:
+        return "Failed to generate final summary from combined chunks"
+    return final_summary
+
+class TextChunker:
+    """Incremental counterpart of split_text_into_chunks for text that arrives in pieces.
+
+    add() appends text and returns the chunks completed by it: whole
+    sentences packed close to max_tokens tokens. finish() returns whatever
+    is left. Only the unfinished tail is re-tokenized, so the cost per piece
+    stays bounded however long the full text grows.
+    """
+
+    def __init__(self, max_tokens=None):
+        self.max_tokens = max_tokens or max_input_tokens()
+        self.buffer = ""
+
+    def add(self, text):
+        self.buffer = f"{self.buffer} {text}" if self.buffer else text
+        return self._take_chunks()
+
+    def finish(self):
+        return self._take_chunks(final=True)
+
+    def _take_chunks(self, final=False):
+        chunks = []
+        while self.buffer.strip():
+            token_starts = tokenize_with_offsets(self.buffer)
+            if len(token_starts) <= self.max_tokens:
+                if final:
+                    chunks.append(self.buffer.strip())
+                    self.buffer = ""
+                break
+            # Close the chunk at the last sentence end before the first token that does not fit
+            limit = int(token_starts[self.max_tokens])
+            ends = [m.end() for m in SENTENCE_END.finditer(self.buffer, 0, limit)]
+            cut = ends[-1] if ends else limit
+            chunks.append(self.buffer[:cut].strip())
+            self.buffer = self.buffer[cut:].lstrip()
+        return chunks
+
+def _summarize_text(text, max_length, min_length, stats, batch_size=None, extractive=None, extractive_tokens=None):
     try:
-        # For short texts, use direct summarization
-        if len(text) <= 3500:
-            result = summarize_with_bart(text, max_length, min_length)
+        if extractive:
+            with timed("extractive"):
+                text = extract_salient(text, extractive, extractive_tokens, stats)
+
+        with timed("chunking"):
+            chunks = split_text_into_chunks(text)
+
+        # For texts that fit in one model pass, use direct summarization
+        if len(chunks) <= 1:
+            stats["depth"] = 1
+            with timed("summarize_single"):
+                result = summarize_with_bart(text, max_length, min_length)
             if result is None:
                 return "Failed to generate summary - model error occurred"
             return result
         
-        # For long texts, use chunking
-        chunks = split_text_into_chunks(text)
+        # For long texts, map over the chunks then reduce the summaries
         print(f"Split into {len(chunks)} chunks")
-        
-        # Summarize chunks in parallel
-        chunk_summaries = summarize_chunks_parallel(chunks, max_length, min_length)
-        
-        if not chunk_summaries:
+        with timed("summarize_map"):
+            summaries = summarize_level(chunks, max_length, min_length, 0, stats, batch_size)
+        if not summaries:
             return "Failed to summarize chunks - all chunk processing failed"
-        
-        # Combine and summarize again
-        combined_summaries = " ".join(chunk_summaries)
-        print(f"Combined summaries length: {len(combined_summaries)} chars")
-        
-        final_summary = summarize_with_bart(combined_summaries, max_length, min_length)
-        if final_summary is None:
-            return "Failed to generate final summary from combined chunks"
-        return final_summary
+        return reduce_summaries(summaries, max_length, min_length, stats, batch_size)
         
     except Exception as e:
         error_msg = f"Unexpected error during summarization: {e}"
         print(error_msg)
-        return error_msg
\ No newline at end of file
+        return error_msg
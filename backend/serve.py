@@ -0,0 +1,49 @@
+"""Production server for the transcription API.
+
+Serves app.py with waitress, a multi-threaded WSGI server, in a single
+process so every request shares one ASR worker pool, batch scheduler and
+set of loaded models (pre-forked workers would each load their own copy).
+Per-route admission control in app.py bounds how many requests run and
+wait; the server's thread and connection limits are sized from it so
+saturated routes answer 429/503 instead of queueing sockets indefinitely.
+
+    cd backend
+    python serve.py
+"""
+import os
+from app import app, route_limiters, start_background_services
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "5001"))
+# Threads for requests outside the limited routes (health, metrics, job polling)
+SERVER_SPARE_THREADS = int(os.getenv("SERVER_SPARE_THREADS", "8"))
+# Overrides the thread count derived from ROUTE_LIMITS
+SERVER_THREADS = int(os.getenv("SERVER_THREADS", "0"))
+
+
+def server_threads():
+    """Enough threads for every admitted and waiting request, plus spares for unlimited routes"""
+    if SERVER_THREADS > 0:
+        return SERVER_THREADS
+    limited = sum(limiter.max_concurrent + limiter.max_queued for limiter in route_limiters.values())
+    return limited + SERVER_SPARE_THREADS
+
+
+def main():
+    threads = server_threads()
+    start_background_services()
+    try:
+        from waitress import serve
+    except ImportError:
+        print("waitress is not installed; falling back to Flask's threaded server (pip install waitress)")
+        app.run(host=SERVER_HOST, port=SERVER_PORT, threaded=True, debug=False)
+        return
+
+    print(f"Serving transcription API on {SERVER_HOST}:{SERVER_PORT} with {threads} threads")
+    # Connections beyond this wait in the listen backlog rather than holding memory
+    serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=threads, connection_limit=threads * 2)
+
+
+# Guarded: ASR worker processes are spawned and re-import the main module
+if __name__ == '__main__':
+    main()
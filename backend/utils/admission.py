@@ -0,0 +1,104 @@
+import math
+import time
+import threading
+
+# Weight of the newest request in the running average of handling time
+HANDLING_TIME_SMOOTHING = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After."""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """Admission control for one route.
+
+    At most max_concurrent requests run at once and up to max_queued more
+    wait, each for at most max_wait seconds. A request arriving with the
+    queue full is rejected straight away (429); one that waits too long is
+    turned away (503). Both carry a Retry-After estimated from the recent
+    handling time, so clients back off instead of piling up.
+    """
+
+    def __init__(self, name, max_concurrent, max_queued=0, max_wait=30):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.avg_seconds = None
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            # Queued requests go first, so a newcomer cannot jump the queue
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                self.admitted += 1
+                return
+            if self.waiting >= self.max_queued:
+                self.rejected += 1
+                raise Overloaded(f"Too many {self.name} requests in progress", 429, self._retry_after())
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise Overloaded(f"Timed out waiting for a {self.name} slot", 503, self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+
+    def release(self, seconds=None):
+        """Free a slot; seconds is how long the request took, for Retry-After estimates."""
+        with self._cond:
+            self.active -= 1
+            if seconds is not None:
+                if self.avg_seconds is None:
+                    self.avg_seconds = seconds
+                else:
+                    self.avg_seconds += HANDLING_TIME_SMOOTHING * (seconds - self.avg_seconds)
+            self._cond.notify()
+
+    def _retry_after(self):
+        """Seconds until a slot is likely free for a new request; caller holds the lock."""
+        if self.avg_seconds is None:
+            return max(1, math.ceil(self.max_wait))
+        return max(1, math.ceil(self.avg_seconds * (self.waiting + 1) / self.max_concurrent))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_seconds": round(self.avg_seconds, 3) if self.avg_seconds is not None else None
+            }
+
+
+def parse_route_limits(spec):
+    """Parse "endpoint=concurrency:queue,..." into {endpoint: (concurrency, queue)}."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        endpoint, _, value = entry.partition('=')
+        concurrency, _, queued = value.partition(':')
+        limits[endpoint.strip()] = (int(concurrency), int(queued or 0))
+    return limits
@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+import numpy as np
+from utils.result_cache import ResultCache, CACHE_DIR, CACHE_TTL_SECONDS
+
+AUDIO_CACHE_MB = int(os.getenv("AUDIO_CACHE_MB", "2048"))
+
+# Streamed entries get a fixed-size .npy header, rewritten with the real
+# length once the last frame is in; 128 bytes fits any realistic length
+STREAM_HEADER_BYTES = 128
+
+
+def _npy_header(dtype, length, size=STREAM_HEADER_BYTES):
+    """Version 1.0 .npy header for a 1-D array, space-padded to size bytes."""
+    fields = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False,
+                   "shape": (length,)})
+    padding = size - 10 - len(fields) - 1
+    return b"\x93NUMPY\x01\x00" + (size - 10).to_bytes(2, "little") + fields.encode("latin1") + b" " * padding + b"\n"
+
+
+class AudioCache(ResultCache):
+    """Decoded audio stored as .npy files and opened memory-mapped.
+
+    Shares ResultCache's disk bookkeeping: entries expire after ttl_seconds
+    and the least recently used are evicted once the directory grows past
+    max_disk_bytes. There is no in-memory tier, since a memory-mapped entry
+    is already served from the page cache. Entries are read-only arrays.
+    """
+
+    extension = ".npy"
+
+    def __init__(self, name="audio", directory=CACHE_DIR, max_disk_bytes=AUDIO_CACHE_MB * 1024 * 1024,
+                 ttl_seconds=CACHE_TTL_SECONDS):
+        super().__init__(name, directory, memory_items=0, max_disk_bytes=max_disk_bytes, ttl_seconds=ttl_seconds)
+
+    def get(self, key):
+        path = self._path(key)
+        audio = None
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                self._remove(path)
+            else:
+                audio = np.load(path, mmap_mode='r')
+                # Touch so eviction sees this entry as recently used
+                os.utime(path)
+        except (OSError, ValueError):
+            audio = None
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return audio
+
+    def set(self, key, audio):
+        if self.max_disk_bytes <= 0:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.ascontiguousarray(audio))
+            replaced = self._existing_size(path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"Failed to write {self.name} cache entry: {e}")
+            return
+        self._track_write(size, replaced)
+
+    def writer(self, key, dtype=np.float32):
+        """An AudioCacheWriter that builds the entry for key from frames as they are decoded."""
+        return AudioCacheWriter(self, key, dtype)
+
+
+class AudioCacheWriter:
+    """Appends frames to a new cache entry; commit() publishes it, discard() drops it.
+
+    Lets a streaming decode fill the cache without holding the whole
+    waveform in memory.
+    """
+
+    def __init__(self, cache, key, dtype):
+        self.cache = cache
+        self.key = key
+        self.dtype = np.dtype(dtype)
+        self.length = 0
+        self._file = None
+        self._tmp_path = None
+        if cache.max_disk_bytes <= 0:
+            return
+        try:
+            os.makedirs(cache.directory, exist_ok=True)
+            self._tmp_path = f"{cache._path(key)}.{threading.get_ident()}.tmp"
+            self._file = open(self._tmp_path, 'wb')
+            self._file.write(_npy_header(self.dtype, 0))
+        except OSError as e:
+            print(f"Failed to start {cache.name} cache entry: {e}")
+            self.discard()
+
+    def append(self, frame):
+        if self._file is None:
+            return
+        try:
+            self._file.write(np.ascontiguousarray(frame, dtype=self.dtype).tobytes())
+            self.length += len(frame)
+        except OSError as e:
+            print(f"Failed to write {self.cache.name} cache entry: {e}")
+            self.discard()
+
+    def commit(self):
+        """Publish the entry; later calls to discard() do nothing."""
+        if self._file is None:
+            return
+        try:
+            self._file.seek(0)
+            self._file.write(_npy_header(self.dtype, self.length))
+            self._file.close()
+            self._file = None
+            path = self.cache._path(self.key)
+            replaced = self.cache._existing_size(path)
+            os.replace(self._tmp_path, path)
+            self._tmp_path = None
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"Failed to write {self.cache.name} cache entry: {e}")
+            self.discard()
+            return
+        self.cache._track_write(size, replaced)
+
+    def discard(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        if self._tmp_path:
+            self.cache._remove(self._tmp_path)
+            self._tmp_path = None
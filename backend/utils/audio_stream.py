@@ -0,0 +1,144 @@
+import os
+import re
+import shutil
+import subprocess
+import threading
+import numpy as np
+
+SAMPLE_RATE = 16000
+READ_SIZE = 64 * 1024
+PROBE_TIMEOUT = float(os.getenv("AUDIO_PROBE_TIMEOUT", "10"))
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_BITRATE = re.compile(r"bitrate: (\d+) kb/s")
+
+
+def _ffmpeg_exe():
+    """Prefer the ffmpeg bundled with imageio-ffmpeg, fall back to the one on PATH."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except ImportError:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+def _feed(source, stdin):
+    """Copy an upload stream or raw bytes into ffmpeg's stdin."""
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source)
+            for start in range(0, len(view), READ_SIZE):
+                stdin.write(view[start:start + READ_SIZE])
+        else:
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            while True:
+                chunk = source.read(READ_SIZE)
+                if not chunk:
+                    break
+                stdin.write(chunk)
+    except (BrokenPipeError, ValueError, OSError):
+        # ffmpeg exited early or the consumer stopped reading
+        pass
+    finally:
+        try: stdin.close()
+        except OSError: pass
+
+
+def stream_audio_frames(source, frame_seconds=30, sample_rate=SAMPLE_RATE):
+    """Decode audio incrementally into mono float32 frames of frame_seconds.
+
+    source may be a path, raw bytes (e.g. a Supabase download) or a readable
+    file object (e.g. a Flask upload). Audio is piped through ffmpeg, so no
+    temp file is written and at most one frame is held in memory here; the
+    last frame may be shorter.
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+    cmd = [
+        _ffmpeg_exe(), "-nostdin", "-loglevel", "error",
+        "-i", os.fspath(source) if is_path else "pipe:0",
+        "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"
+    ]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL if is_path else subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    feeder = None
+    if not is_path:
+        feeder = threading.Thread(target=_feed, args=(source, proc.stdin), daemon=True)
+        feeder.start()
+
+    frame_bytes = int(frame_seconds * sample_rate) * np.dtype(np.float32).itemsize
+    frames_yielded = 0
+    try:
+        while True:
+            data = proc.stdout.read(frame_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % np.dtype(np.float32).itemsize
+            if usable:
+                frames_yielded += 1
+                yield np.frombuffer(data[:usable], dtype=np.float32)
+            if len(data) < frame_bytes:
+                break
+
+        returncode = proc.wait()
+        if returncode != 0 and frames_yielded == 0:
+            error = proc.stderr.read().decode(errors='ignore').strip()
+            raise RuntimeError(f"Audio decoding failed: {error or f'ffmpeg exited with {returncode}'}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+        if feeder:
+            feeder.join(timeout=5)
+
+
+def probe_audio(source, timeout=PROBE_TIMEOUT):
+    """(duration seconds, bitrate kb/s) from the container header, as reported by ffmpeg.
+
+    Either is None when unknown; piped input (bytes or file objects) often
+    has no duration, but usually a bitrate. Only as much of the source as
+    ffmpeg needs to probe it is read; file objects are rewound afterwards.
+    """
+    is_path = isinstance(source, (str, os.PathLike))
+    cmd = [_ffmpeg_exe(), "-nostdin", "-hide_banner", "-i", os.fspath(source) if is_path else "pipe:0"]
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL if is_path else subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+    except OSError:
+        return None, None
+    feeder = None
+    if not is_path:
+        feeder = threading.Thread(target=_feed, args=(source, proc.stdin), daemon=True)
+        feeder.start()
+    try:
+        # ffmpeg exits once the input is probed, since no output is given
+        proc.wait(timeout=timeout)
+        info = proc.stderr.read().decode(errors='ignore')
+    except subprocess.TimeoutExpired:
+        return None, None
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stderr.close()
+        if feeder:
+            feeder.join(timeout=5)
+        if not is_path and hasattr(source, 'seek'):
+            source.seek(0)
+
+    duration = _DURATION.search(info)
+    bitrate = _BITRATE.search(info)
+    return (
+        int(duration[1]) * 3600 + int(duration[2]) * 60 + float(duration[3]) if duration else None,
+        int(bitrate[1]) if bitrate else None
+    )
@@ -0,0 +1,78 @@
+import os
+import zlib
+
+# A draft segment is re-transcribed by the larger model when any of these
+# trip; the defaults are the thresholds Whisper itself uses to retry decoding
+REFINE_LOGPROB_THRESHOLD = float(os.getenv("REFINE_LOGPROB_THRESHOLD", "-1.0"))
+NO_SPEECH_THRESHOLD = float(os.getenv("NO_SPEECH_THRESHOLD", "0.6"))
+REFINE_COMPRESSION_RATIO = float(os.getenv("REFINE_COMPRESSION_RATIO", "2.4"))
+
+# Longest token sequence the Whisper decoder accepts
+WHISPER_MAX_TARGET_TOKENS = 448
+
+
+def compression_ratio(text):
+    """Length of text over its zlib-compressed length; high for the repetition loops small models fall into."""
+    data = text.strip().encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+def score_transcript(pipe, audio, text):
+    """Whisper's (avg_logprob, no_speech_prob) for text as the transcript of audio.
+
+    Uses one encoder pass and two teacher-forced decoder passes over the
+    given tokens instead of decoding again. no_speech_prob is read from the
+    first decoder position, as Whisper does; the language token is the one
+    the model itself predicts there. Raises for pipelines that do not wrap
+    a PyTorch Whisper model (such as the ONNX backend).
+    """
+    import torch
+    model, tokenizer = pipe.model, pipe.tokenizer
+    token_id = tokenizer.convert_tokens_to_ids
+    no_speech_id = token_id("<|nospeech|>")
+    if no_speech_id == tokenizer.unk_token_id:
+        no_speech_id = token_id("<|nocaptions|>")
+
+    features = pipe.feature_extractor(audio, sampling_rate=16000, return_tensors="pt").input_features
+    with torch.no_grad():
+        encoded = model.get_encoder()(features.to(model.device, model.dtype))
+        start = [token_id("<|startoftranscript|>")]
+        first = torch.log_softmax(
+            model(encoder_outputs=encoded, decoder_input_ids=torch.tensor([start], device=model.device)).logits[0, -1].float(),
+            dim=-1
+        )
+        prefix = list(start)
+        languages = list((getattr(model.generation_config, "lang_to_id", None) or {}).values())
+        if languages:
+            prefix.append(max(languages, key=lambda i: first[i].item()))
+        prefix += [token_id("<|transcribe|>"), token_id("<|notimestamps|>")]
+
+        # Whisper's transcripts start with a space; score the tokens it actually emitted
+        text = text.strip()
+        target = tokenizer(" " + text, add_special_tokens=False).input_ids if text else []
+        target = target[:WHISPER_MAX_TARGET_TOKENS - len(prefix) - 1] + [tokenizer.eos_token_id]
+        ids = torch.tensor([prefix + target[:-1]], device=model.device)
+        logits = model(encoder_outputs=encoded, decoder_input_ids=ids).logits[0, len(prefix) - 1:].float()
+        logprobs = torch.log_softmax(logits, dim=-1)
+        target_logprobs = logprobs.gather(-1, torch.tensor(target, device=model.device)[:, None])
+    return target_logprobs.mean().item(), first[no_speech_id].exp().item()
+
+
+def refine_reason(text, avg_logprob=None, no_speech_prob=None):
+    """Why a draft segment should be re-transcribed by a larger model, or None.
+
+    avg_logprob and no_speech_prob are None when the draft could not be
+    scored; only the text checks apply then.
+    """
+    if not text.strip():
+        # VAD heard speech; refine unless the model is confident there is none
+        if no_speech_prob is None or no_speech_prob < NO_SPEECH_THRESHOLD:
+            return "empty"
+        return None
+    if compression_ratio(text) > REFINE_COMPRESSION_RATIO:
+        return "repetition"
+    if no_speech_prob is not None and no_speech_prob > NO_SPEECH_THRESHOLD:
+        return "no_speech"
+    if avg_logprob is not None and avg_logprob < REFINE_LOGPROB_THRESHOLD:
+        return "low_logprob"
+    return None
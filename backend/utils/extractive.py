@@ -0,0 +1,95 @@
+import re
+import numpy as np
+
+EXTRACTIVE_METHODS = ("tfidf", "textrank")
+
+# TextRank builds a dense sentences x terms matrix; above this many cells it
+# falls back to TF-IDF scoring, which stays linear in the input
+TEXTRANK_MAX_CELLS = 20_000_000
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_ITERATIONS = 50
+
+WORD = re.compile(r"[a-z0-9']+")
+
+
+def tfidf_entries(sentences):
+    """Sparse TF-IDF matrix as (rows, cols, values) arrays, rows L2-normalised.
+
+    Each row is a sentence and each column a term; only non-zero entries are
+    stored, so memory grows with the text rather than sentences x vocabulary.
+    """
+    vocabulary = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for word in WORD.findall(sentence.lower()):
+            rows.append(row)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+    if not rows:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32), 0
+
+    # Merge repeated (sentence, term) pairs into term counts
+    pairs = np.array(rows, dtype=np.int64) * len(vocabulary) + np.array(cols, dtype=np.int64)
+    pairs, counts = np.unique(pairs, return_counts=True)
+    rows, cols = np.divmod(pairs, len(vocabulary))
+
+    document_frequency = np.bincount(cols, minlength=len(vocabulary))
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    values = (1 + np.log(counts)) * idf[cols]
+    norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(sentences)))
+    values = values / np.maximum(norms[rows], 1e-12)
+    return rows, cols, values.astype(np.float32), len(vocabulary)
+
+
+def tfidf_scores(rows, cols, values, num_sentences, num_terms):
+    """Cosine similarity of each sentence to the centroid of the document."""
+    centroid = np.bincount(cols, weights=values, minlength=num_terms)
+    centroid /= max(np.linalg.norm(centroid), 1e-12)
+    return np.bincount(rows, weights=values * centroid[cols], minlength=num_sentences)
+
+
+def textrank_scores(rows, cols, values, num_sentences, num_terms):
+    """PageRank over the graph of sentences weighted by TF-IDF cosine similarity."""
+    matrix = np.zeros((num_sentences, num_terms), dtype=np.float32)
+    matrix[rows, cols] = values
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with the rest link to every sentence equally
+    transition = np.where(out_weight > 0, similarity / np.maximum(out_weight, 1e-12), 1 / num_sentences)
+
+    scores = np.full(num_sentences, 1 / num_sentences)
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = (1 - TEXTRANK_DAMPING) / num_sentences + TEXTRANK_DAMPING * (scores @ transition)
+        converged = np.abs(updated - scores).sum() < 1e-6
+        scores = updated
+        if converged:
+            break
+    return scores
+
+
+def sentence_scores(sentences, method="tfidf"):
+    """Salience of each sentence, higher is more central to the text."""
+    if method not in EXTRACTIVE_METHODS:
+        raise ValueError(f"Unknown extractive method '{method}'. Available: {', '.join(EXTRACTIVE_METHODS)}")
+    rows, cols, values, num_terms = tfidf_entries(sentences)
+    if num_terms == 0:
+        return np.zeros(len(sentences))
+    if method == "textrank" and len(sentences) * num_terms <= TEXTRANK_MAX_CELLS:
+        return textrank_scores(rows, cols, values, len(sentences), num_terms)
+    return tfidf_scores(rows, cols, values, len(sentences), num_terms)
+
+
+def select_sentences(scores, token_counts, max_tokens):
+    """Indices of the highest scoring sentences that fit in max_tokens, in text order.
+
+    Sentences are taken best first; one that would overflow the budget is
+    skipped so shorter, lower scoring sentences can still fill it.
+    """
+    token_counts = np.asarray(token_counts)
+    selected = []
+    used = 0
+    for index in np.argsort(-np.asarray(scores), kind="stable"):
+        if used + token_counts[index] <= max_tokens:
+            selected.append(int(index))
+            used += int(token_counts[index])
+    return sorted(selected)
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from utils.result_cache import CACHE_DIR
+from utils.metrics import observe
+
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(CACHE_DIR, "jobs"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+# Jobs failing with a retryable error (e.g. memory is short right now) are
+# queued again after JOB_RETRY_DELAY seconds, up to JOB_MAX_RETRIES times
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "5"))
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "30"))
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting."""
+
+
+class JobQueue:
+    """Local job queue persisted in SQLite.
+
+    Jobs run on a fixed set of worker threads. The highest priority queued
+    job (lowest number, then oldest) whose type is under its concurrency limit
+    runs next, so a few long jobs cannot take every worker from short ones.
+    Input payloads are stored as files next to the database. A handler
+    exception with a true retryable attribute puts the job back in the
+    queue after retry_delay seconds instead of failing it, up to
+    max_retries times.
+    """
+
+    def __init__(self, directory=JOBS_DIR, workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED, type_limits=None,
+                 max_retries=JOB_MAX_RETRIES, retry_delay=JOB_RETRY_DELAY):
+        self.directory = directory
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.type_limits = type_limits or {}
+        self.handlers = {}
+        self._queued = []
+        self._running = {}
+        self._cond = threading.Condition()
+        self._started = False
+        self._seq = 0
+
+        self._db_lock = threading.Lock()
+        self._db = None
+
+    def register(self, job_type, handler):
+        """handler(params, input_path, report_progress) -> JSON-serialisable result
+
+        report_progress(done, total, detail=None); detail is any JSON-serialisable
+        value shown with the job's progress.
+        """
+        self.handlers[job_type] = handler
+
+    def start(self):
+        """Open the database, requeue persisted jobs and start the workers.
+
+        Kept out of __init__ so processes that merely import the app (such as
+        spawned ASR workers) never touch the queue.
+        """
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        self._connect()
+        self._recover()
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, job_type, params=None, payload=None, priority=10):
+        """Queue a job and return its id. payload (bytes) is stored as the job's input file."""
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        self.start()
+        with self._cond:
+            if len(self._queued) >= self.max_queued:
+                raise QueueFull(f"{len(self._queued)} jobs already queued")
+
+        job_id = uuid.uuid4().hex
+        input_path = None
+        if payload is not None:
+            input_path = os.path.join(self.directory, f"{job_id}.input")
+            with open(input_path, 'wb') as f:
+                f.write(payload)
+
+        self._execute(
+            "INSERT INTO jobs (id, type, status, priority, params, input_path, created) VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, job_type, priority, json.dumps(params or {}), input_path, time.time())
+        )
+        self._enqueue(job_id, job_type, priority)
+        return job_id
+
+    def get(self, job_id):
+        self._connect()
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT id, type, status, priority, result, error, progress_done, progress_total, progress_detail, attempts, created, started, finished FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        (job_id, job_type, status, priority, result, error,
+         done, total, detail, attempts, created, started, finished) = row
+        job = {
+            "job_id": job_id,
+            "type": job_type,
+            "status": status,
+            "priority": priority,
+            "progress": {"done": done, "total": total, "detail": json.loads(detail) if detail else None},
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts,
+            "created": created,
+            "started": started,
+            "finished": finished
+        }
+        if status == "queued":
+            with self._cond:
+                ids = [entry[3] for entry in sorted(self._queued)]
+            job["queue_position"] = ids.index(job_id) + 1 if job_id in ids else None
+        return job
+
+    def stats(self):
+        with self._cond:
+            running = {}
+            for job_type in self._running.values():
+                running[job_type] = running.get(job_type, 0) + 1
+            return {
+                "queued": len(self._queued),
+                "running": running,
+                "workers": self.workers,
+                "max_queued": self.max_queued
+            }
+
+    def _connect(self):
+        with self._db_lock:
+            if self._db is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.directory, "jobs.sqlite3"), check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    params TEXT,
+                    input_path TEXT,
+                    result TEXT,
+                    error TEXT,
+                    progress_done INTEGER DEFAULT 0,
+                    progress_total INTEGER DEFAULT 0,
+                    progress_detail TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    created REAL,
+                    started REAL,
+                    finished REAL
+                )
+            """)
+            # Databases created before these columns existed
+            for column in ("progress_detail TEXT", "attempts INTEGER DEFAULT 0"):
+                try:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+                except sqlite3.OperationalError:
+                    pass
+            self._db.commit()
+
+    def _execute(self, sql, args=()):
+        with self._db_lock:
+            self._db.execute(sql, args)
+            self._db.commit()
+
+    def _enqueue(self, job_id, job_type, priority):
+        with self._cond:
+            self._seq += 1
+            self._queued.append((priority, self._seq, job_type, job_id))
+            self._cond.notify_all()
+
+    def _recover(self):
+        """Requeue jobs left waiting by a previous process; jobs cut off mid-run are failed."""
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = 'Interrupted by server restart', finished = ? WHERE status = 'running'",
+            (time.time(),)
+        )
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT id, type, priority FROM jobs WHERE status = 'queued' ORDER BY created"
+            ).fetchall()
+        for job_id, job_type, priority in rows:
+            self._enqueue(job_id, job_type, priority)
+
+    def _next_job(self):
+        """Pop the best runnable job; caller holds self._cond."""
+        running = {}
+        for job_type in self._running.values():
+            running[job_type] = running.get(job_type, 0) + 1
+        for entry in sorted(self._queued):
+            job_type = entry[2]
+            limit = self.type_limits.get(job_type)
+            if limit is None or running.get(job_type, 0) < limit:
+                self._queued.remove(entry)
+                return entry
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                entry = self._next_job()
+                while entry is None:
+                    self._cond.wait()
+                    entry = self._next_job()
+                _, _, job_type, job_id = entry
+                self._running[job_id] = job_type
+            try:
+                self._run(job_id, job_type)
+            finally:
+                with self._cond:
+                    self._running.pop(job_id, None)
+                    self._cond.notify_all()
+
+    def _run(self, job_id, job_type):
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT params, input_path, created, priority, attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return
+        params, input_path = json.loads(row[0] or "{}"), row[1]
+        priority, attempts = row[3], row[4] or 0
+        started = time.time()
+        observe("job_queue_wait", started - (row[2] or started))
+        self._execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (started, job_id))
+
+        def report_progress(done, total, detail=None):
+            self._execute(
+                "UPDATE jobs SET progress_done = ?, progress_total = ?, progress_detail = ? WHERE id = ?",
+                (done, total, json.dumps(detail) if detail is not None else None, job_id)
+            )
+
+        try:
+            result = self.handlers[job_type](params, input_path, report_progress)
+            self._execute(
+                "UPDATE jobs SET status = 'completed', result = ?, error = NULL, finished = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id)
+            )
+        except Exception as e:
+            if getattr(e, "retryable", False) and attempts < self.max_retries:
+                print(f"Job {job_id} ({job_type}) will be retried in {self.retry_delay:.0f}s: {e}")
+                self._execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, attempts = ?, started = NULL WHERE id = ?",
+                    (str(e), attempts + 1, job_id)
+                )
+                retry = threading.Timer(self.retry_delay, self._enqueue, (job_id, job_type, priority))
+                retry.daemon = True
+                retry.start()
+                # The input is needed again
+                return
+            print(f"Job {job_id} ({job_type}) failed: {e}")
+            self._execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished = ? WHERE id = ?",
+                (str(e), time.time(), job_id)
+            )
+        if input_path:
+            try: os.unlink(input_path)
+            except OSError: pass
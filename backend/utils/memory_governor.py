@@ -0,0 +1,205 @@
+import os
+import io
+import wave
+import itertools
+import threading
+from contextlib import contextmanager
+from utils.parallelism import available_memory_mb
+from utils.audio_stream import probe_audio
+
+# Memory the server may commit across all requests, models and ASR workers;
+# 0 means 90% of the memory available when the server starts
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "0")) or int((available_memory_mb() or 8192) * 0.9)
+# Most a single request may reserve, whatever is free
+REQUEST_MEMORY_BUDGET_MB = int(os.getenv("REQUEST_MEMORY_BUDGET_MB", "2048"))
+# Lowest bitrate assumed when a file's duration cannot be read from it and
+# has to be guessed from its size
+MIN_AUDIO_BITRATE_KBPS = int(os.getenv("MIN_AUDIO_BITRATE_KBPS", "32"))
+
+# Decoded audio is mono float32 at 16 kHz
+DECODED_BYTES_PER_SECOND = 16000 * 4
+
+_usage = []
+_reservations = {}
+_ids = itertools.count()
+_lock = threading.Lock()
+_rejected = 0
+
+
+class MemoryBudgetExceeded(Exception):
+    """A request does not fit in memory. retryable is False when it never could."""
+
+    def __init__(self, message, needed_mb, available_mb, retryable=True):
+        super().__init__(message)
+        self.needed_mb = needed_mb
+        self.available_mb = available_mb
+        self.retryable = retryable
+
+
+def register_usage(usage):
+    """usage() -> MB already committed outside reservations (loaded models, worker RSS)."""
+    _usage.append(usage)
+
+
+def record_rejection():
+    global _rejected
+    with _lock:
+        _rejected += 1
+
+
+def committed_mb():
+    total = 0
+    for usage in list(_usage):
+        try:
+            total += usage()
+        except Exception as e:
+            print(f"Memory usage probe failed: {e}")
+    return total
+
+
+def reserved_mb():
+    with _lock:
+        return sum(mb for _, mb in _reservations.values())
+
+
+def available_mb():
+    """Budget left for new reservations."""
+    return MEMORY_BUDGET_MB - committed_mb() - reserved_mb()
+
+
+@contextmanager
+def reserve(mb, label="request"):
+    """Hold mb of the budget for the duration of the block.
+
+    Raises MemoryBudgetExceeded instead of letting the request run when it
+    is over REQUEST_MEMORY_BUDGET_MB or the global budget is used up.
+    """
+    mb = max(0, int(mb))
+    if mb > REQUEST_MEMORY_BUDGET_MB:
+        record_rejection()
+        raise MemoryBudgetExceeded(
+            f"{label} needs about {mb} MB, over the per-request limit of {REQUEST_MEMORY_BUDGET_MB} MB",
+            mb, REQUEST_MEMORY_BUDGET_MB, retryable=False
+        )
+    committed = committed_mb()
+    with _lock:
+        free = MEMORY_BUDGET_MB - committed - sum(reserved for _, reserved in _reservations.values())
+        fits = mb <= free
+        if fits:
+            reservation = next(_ids)
+            _reservations[reservation] = (label, mb)
+    if not fits:
+        record_rejection()
+        raise MemoryBudgetExceeded(
+            f"{label} needs about {mb} MB but only {max(0, free)} MB of the memory budget is free",
+            mb, max(0, free)
+        )
+    try:
+        yield mb
+    finally:
+        with _lock:
+            _reservations.pop(reservation, None)
+
+
+def source_size(source):
+    """Size in bytes of raw bytes, a path or a seekable file object; None if unknown."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if isinstance(source, (str, os.PathLike)):
+        try:
+            return os.path.getsize(source)
+        except OSError:
+            return None
+    try:
+        position = source.tell()
+        source.seek(0, os.SEEK_END)
+        size = source.tell()
+        source.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def estimate_audio_seconds(num_bytes):
+    """Longest the audio in num_bytes of a compressed file could plausibly last."""
+    return num_bytes * 8 / (MIN_AUDIO_BITRATE_KBPS * 1000)
+
+
+def _wav_seconds(source):
+    """Duration from a PCM WAV header, or None if source is not one."""
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        elif hasattr(source, 'seek'):
+            source.seek(0)
+        with wave.open(source if hasattr(source, 'read') else os.fspath(source), 'rb') as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError, OSError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    finally:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+
+
+def audio_seconds(source, num_bytes=None):
+    """Duration of the audio in source, for sizing its decode.
+
+    Read from the WAV header or the container as probed by ffmpeg; with only
+    a bitrate known it is worked out from the size, and with neither the
+    MIN_AUDIO_BITRATE_KBPS bound is used.
+    """
+    num_bytes = source_size(source) if num_bytes is None else num_bytes
+    seconds = _wav_seconds(source)
+    if seconds is not None:
+        return seconds
+    duration, bitrate = probe_audio(source)
+    if duration is not None:
+        return duration
+    if bitrate and num_bytes:
+        return num_bytes * 8 / (bitrate * 1000)
+    return estimate_audio_seconds(num_bytes or 0)
+
+
+def decoded_audio_mb(seconds):
+    return seconds * DECODED_BYTES_PER_SECOND / (1024 * 1024)
+
+
+def process_rss_mb(pid):
+    """Resident memory of a process from /proc, or 0 if it cannot be read."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def stats():
+    with _lock:
+        reservations = [mb for _, mb in _reservations.values()]
+        rejected = _rejected
+    committed = committed_mb()
+    return {
+        "budget_mb": MEMORY_BUDGET_MB,
+        "request_budget_mb": REQUEST_MEMORY_BUDGET_MB,
+        "committed_mb": committed,
+        "reserved_mb": sum(reservations),
+        "available_mb": MEMORY_BUDGET_MB - committed - sum(reservations),
+        "reservations": len(reservations),
+        "rejected": rejected
+    }
+
+
+def collect_metrics():
+    current = stats()
+    return [
+        ("cognivue_memory_budget_mb", "gauge", "Memory the server may commit", [({}, current["budget_mb"])]),
+        ("cognivue_memory_committed_mb", "gauge", "Memory held by loaded models and ASR workers",
+         [({}, current["committed_mb"])]),
+        ("cognivue_memory_reserved_mb", "gauge", "Memory reserved by requests in progress",
+         [({}, current["reserved_mb"])]),
+        ("cognivue_memory_rejected_total", "counter", "Requests rejected for lack of memory",
+         [({}, current["rejected"])])
+    ]
@@ -0,0 +1,142 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_stages = {}
+_stages_lock = threading.Lock()
+_collectors = []
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def observe(stage, seconds):
+    """Record one duration for a pipeline stage, and in the current trace if any."""
+    with _stages_lock:
+        entry = _stages.get(stage)
+        if entry is None:
+            entry = _stages[stage] = {"buckets": [0] * len(STAGE_BUCKETS), "count": 0, "sum": 0.0}
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                entry["buckets"][i] += 1
+        entry["count"] += 1
+        entry["sum"] += seconds
+
+    trace = _trace.get()
+    if trace is not None:
+        trace["events"].append({
+            "stage": stage,
+            "start": round(time.time() - seconds - trace["started"], 4),
+            "seconds": round(seconds, 4)
+        })
+
+
+@contextmanager
+def timed(stage):
+    start = time.time()
+    try:
+        yield
+    finally:
+        observe(stage, time.time() - start)
+
+
+def timed_iter(stage, iterable):
+    """Yield from iterable, recording the total time spent waiting on it as one observation."""
+    iterator = iter(iterable)
+    waited = 0.0
+    try:
+        while True:
+            start = time.time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                waited += time.time() - start
+            yield item
+    finally:
+        observe(stage, waited)
+
+
+@contextmanager
+def trace_request(enabled=True):
+    """Collect the stages timed in this context into a per-request trace.
+
+    Yields a dict to return to the client (None when disabled); its
+    "totals" are filled in when the block exits.
+    """
+    if not enabled:
+        yield None
+        return
+    trace = {"started": time.time(), "events": []}
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+        totals = {}
+        for event in trace["events"]:
+            total = totals.setdefault(event["stage"], {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] = round(total["seconds"] + event["seconds"], 4)
+        trace["totals"] = totals
+        trace["total_seconds"] = round(time.time() - trace.pop("started"), 4)
+
+
+def register_collector(collector):
+    """collector() -> [(name, type, help, [(labels, value), ...]), ...], called on every scrape."""
+    _collectors.append(collector)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP cognivue_stage_seconds Time spent in each pipeline stage",
+        "# TYPE cognivue_stage_seconds histogram"
+    ]
+    with _stages_lock:
+        stages = {name: dict(entry, buckets=list(entry["buckets"])) for name, entry in _stages.items()}
+    for stage, entry in sorted(stages.items()):
+        for bound, count in zip(STAGE_BUCKETS, entry["buckets"]):
+            lines.append(f'cognivue_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'cognivue_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+        lines.append(f'cognivue_stage_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+        lines.append(f'cognivue_stage_seconds_count{{stage="{stage}"}} {entry["count"]}')
+
+    # Collectors may report samples of the same metric (e.g. one per cache)
+    metrics = {}
+    for collector in list(_collectors):
+        try:
+            collected = collector()
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+            continue
+        for name, metric_type, help_text, samples in collected:
+            metrics.setdefault(name, (metric_type, help_text, []))[2].extend(samples)
+
+    for name, (metric_type, help_text, samples) in metrics.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def cache_metrics(cache):
+    """Metrics for a ResultCache, labelled with its name."""
+    stats = cache.stats()
+    labels = {"cache": cache.name}
+    return [
+        ("cognivue_cache_hits_total", "counter", "Result cache hits", [(labels, stats["hits"])]),
+        ("cognivue_cache_misses_total", "counter", "Result cache misses", [(labels, stats["misses"])]),
+        ("cognivue_cache_hit_rate", "gauge", "Result cache hit rate since start", [(labels, stats["hit_rate"])]),
+        ("cognivue_cache_disk_bytes", "gauge", "Result cache size on disk", [(labels, stats["disk_bytes"])])
+    ]
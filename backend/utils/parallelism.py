@@ -0,0 +1,82 @@
+import os
+
+# Whisper sees at most 30s per pass, so longer segments would be truncated
+MAX_SEGMENT_LENGTH = 30
+# Shortest segment a client may ask for, and the shortest the planner picks
+MIN_SEGMENT_LENGTH = int(os.getenv("MIN_SEGMENT_LENGTH", "5"))
+PLANNED_MIN_SEGMENT_LENGTH = int(os.getenv("PLANNED_MIN_SEGMENT_LENGTH", "10"))
+# Hard cap on in-flight batches for one request, whatever the pool size
+MAX_PROCESSES = int(os.getenv("MAX_PROCESSES", "8"))
+# Share of available memory the ASR workers' models may take
+WORKER_MEMORY_FRACTION = 0.75
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo, falling back to free pages; None if unknown."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_pool_size(model_mb):
+    """Worker processes this host can run, each holding its own copy of the model.
+
+    Roughly one per physical core (torch already uses several threads per
+    worker), and no more than fit in available memory.
+    """
+    workers = max(1, available_cores() // 2)
+    memory_mb = available_memory_mb()
+    if memory_mb is not None and model_mb:
+        workers = min(workers, max(1, int(memory_mb * WORKER_MEMORY_FRACTION // model_mb)))
+    return workers
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def plan_parallelism(duration, pool_size, batch_size, active_requests=1,
+                     num_processes=None, segment_length=None):
+    """Pick num_processes and segment_length for one transcription request.
+
+    num_processes is how many batches of this request may be in flight, so it
+    is capped at this request's fair share of the pool given the requests
+    already running. Without a segment_length, short audio is cut finely
+    enough to keep that share busy and long audio uses Whisper's full 30s
+    window. Client-supplied values are clamped, never trusted.
+    duration may be None when it is not known up front (streaming).
+    """
+    share = max(1, min(pool_size, MAX_PROCESSES) // max(1, active_requests))
+    planned_processes = share if num_processes is None else clamp(int(num_processes), 1, share)
+
+    if segment_length is not None:
+        planned_length = clamp(int(segment_length), MIN_SEGMENT_LENGTH, MAX_SEGMENT_LENGTH)
+    elif duration is None:
+        planned_length = MAX_SEGMENT_LENGTH
+    else:
+        target = duration / (planned_processes * batch_size)
+        planned_length = clamp(round(target), PLANNED_MIN_SEGMENT_LENGTH, MAX_SEGMENT_LENGTH)
+
+    return {
+        "num_processes": planned_processes,
+        "segment_length": planned_length,
+        "clamped": (num_processes is not None and planned_processes != int(num_processes))
+                   or (segment_length is not None and planned_length != int(segment_length)),
+        "pool_size": pool_size,
+        "active_requests": active_requests
+    }
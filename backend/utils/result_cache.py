@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"))
+CACHE_MEMORY_ITEMS = int(os.getenv("CACHE_MEMORY_ITEMS", "256"))
+CACHE_DISK_MB = int(os.getenv("CACHE_DISK_MB", "512"))
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+HASH_READ_SIZE = 1024 * 1024
+
+
+def hash_source(source):
+    """SHA-256 of raw bytes, a readable file object or a file path.
+
+    File objects are rewound afterwards so they can still be decoded.
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif hasattr(source, 'read'):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        for chunk in iter(lambda: source.read(HASH_READ_SIZE), b''):
+            digest.update(chunk)
+        if hasattr(source, 'seek'):
+            source.seek(0)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_READ_SIZE), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Combine a content hash and the parameters that affect the result into one key."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache of JSON-serialisable results.
+
+    An in-memory LRU sits in front of a directory of JSON files. Disk entries
+    expire after ttl_seconds and the least recently used are evicted once the
+    directory grows past max_disk_bytes.
+    """
+
+    extension = ".json"
+
+    def __init__(self, name, directory=CACHE_DIR, memory_items=CACHE_MEMORY_ITEMS,
+                 max_disk_bytes=CACHE_DISK_MB * 1024 * 1024, ttl_seconds=CACHE_TTL_SECONDS):
+        self.name = name
+        self.directory = os.path.join(directory, name)
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = None
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.extension}")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, entry)
+        return entry[1]
+
+    def set(self, key, value):
+        entry = (time.time(), value)
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes or 0
+            }
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key, now):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if now - data.get("created", 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+        try:
+            # Touch so eviction sees this entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return data["created"], data["value"]
+
+    def _write_disk(self, key, entry):
+        if self.max_disk_bytes <= 0:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"created": entry[0], "value": entry[1]}, f)
+            replaced = self._existing_size(path)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Failed to write {self.name} cache entry: {e}")
+            return
+        self._track_write(size, replaced)
+
+    def _existing_size(self, path):
+        """Size of the entry a write to path is about to replace, 0 if none."""
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _track_write(self, size, replaced=0):
+        """Account for a new entry of size bytes that replaced one of replaced bytes, evicting if over budget."""
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += size - replaced
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _scan_disk(self):
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries, total
+        for name in names:
+            if not name.endswith(self.extension):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        return entries, total
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones, until under budget."""
+        entries, total = self._scan_disk()
+        now = time.time()
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_disk_bytes and now - mtime <= self.ttl_seconds:
+                break
+            if self._remove(path):
+                total -= size
+        self._disk_bytes = total
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+
+# Decoded audio is always mono float32 at 16 kHz
+AUDIO_DTYPE = np.float32
+
+
+def create_shared_audio(audio_data):
+    """Copy decoded audio into a new shared memory block; free it with release_shared_audio."""
+    audio_data = np.ascontiguousarray(audio_data, dtype=AUDIO_DTYPE)
+    shm = shared_memory.SharedMemory(create=True, size=max(audio_data.nbytes, 1))
+    buffer = np.ndarray(audio_data.shape, dtype=AUDIO_DTYPE, buffer=shm.buf)
+    buffer[:] = audio_data
+    del buffer
+    return shm
+
+
+def release_shared_audio(shm):
+    shm.close()
+    shm.unlink()
+
+
+@contextmanager
+def shared_audio(audio_data):
+    """Copy decoded audio into one shared memory block for the lifetime of a request.
+
+    Yields the block name; workers read segments from it with attach_shared_segment
+    instead of receiving a pickled copy of every slice.
+    """
+    shm = create_shared_audio(audio_data)
+    try:
+        yield shm.name
+    finally:
+        release_shared_audio(shm)
+
+
+def attach_shared_segment(name, offset, length):
+    """Attach to a shared audio block and return (shm, view of [offset, offset + length)).
+
+    The caller must drop the view before calling shm.close().
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    segment = np.ndarray(
+        (length,),
+        dtype=AUDIO_DTYPE,
+        buffer=shm.buf,
+        offset=offset * np.dtype(AUDIO_DTYPE).itemsize
+    )
+    return shm, segment
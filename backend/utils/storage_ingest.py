@@ -0,0 +1,185 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Downloads in flight at once; they share the storage client's HTTP connections
+INGEST_DOWNLOAD_WORKERS = int(os.getenv("INGEST_DOWNLOAD_WORKERS", "4"))
+# Files transcribed at once; their segments are batched together by the ASR scheduler
+INGEST_TRANSCRIBE_WORKERS = int(os.getenv("INGEST_TRANSCRIBE_WORKERS", "2"))
+# Downloaded files allowed to wait for transcription, bounding memory
+INGEST_PREFETCH = int(os.getenv("INGEST_PREFETCH", "4"))
+INGEST_DOWNLOAD_RETRIES = int(os.getenv("INGEST_DOWNLOAD_RETRIES", "2"))
+# Transcriptions turned away by a retryable error (memory short right now)
+# are retried after INGEST_RETRY_DELAY seconds, doubling each time
+INGEST_TRANSCRIBE_RETRIES = int(os.getenv("INGEST_TRANSCRIBE_RETRIES", "3"))
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", "15"))
+INGEST_MAX_FILES = int(os.getenv("INGEST_MAX_FILES", "10000"))
+# Minimum seconds between progress reports, so large batches do not flood the job store
+INGEST_PROGRESS_INTERVAL = float(os.getenv("INGEST_PROGRESS_INTERVAL", "1"))
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.webm')
+LIST_PAGE_SIZE = 100
+
+
+def list_audio_files(bucket, prefix="", limit=INGEST_MAX_FILES):
+    """Paths of the audio objects under prefix, following sub-folders.
+
+    bucket is a storage bucket API (supabase.storage.from_(name) or a local
+    stand-in) offering list(path, options). prefix may end in a partial
+    file name, which is matched against object names in its folder.
+    """
+    folder, _, name_prefix = prefix.rpartition('/')
+    files = []
+    pending = [(folder, name_prefix)]
+    while pending and len(files) < limit:
+        path, name_prefix = pending.pop(0)
+        offset = 0
+        while len(files) < limit:
+            page = bucket.list(path, {"limit": LIST_PAGE_SIZE, "offset": offset, "search": name_prefix})
+            for entry in page:
+                name = entry["name"]
+                if not name.startswith(name_prefix):
+                    continue
+                full_path = f"{path}/{name}" if path else name
+                if entry.get("id") is None:
+                    # Folders have no id
+                    pending.append((full_path, ""))
+                elif name.lower().endswith(AUDIO_EXTENSIONS):
+                    files.append(full_path)
+            if len(page) < LIST_PAGE_SIZE:
+                break
+            offset += LIST_PAGE_SIZE
+    return files[:limit]
+
+
+def download_with_retry(bucket, path, retries=INGEST_DOWNLOAD_RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            return bucket.download(path)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            print(f"Download of {path} failed ({e}), retrying")
+            time.sleep(2 ** attempt)
+
+
+def ingest_files(bucket, paths, transcribe, progress=None,
+                 download_workers=INGEST_DOWNLOAD_WORKERS,
+                 transcribe_workers=INGEST_TRANSCRIBE_WORKERS,
+                 prefetch=INGEST_PREFETCH):
+    """Download and transcribe paths, overlapping downloads with transcription.
+
+    Downloads run on a bounded thread pool that reuses the bucket's client,
+    and each finished download goes straight to a transcription worker, so
+    the next files are fetched while earlier ones are transcribed. At most
+    prefetch downloaded files wait for a transcription worker at any time.
+    transcribe(audio_bytes) returns the transcript. progress(done, total,
+    files) is called as files finish, where files maps each path to its
+    status, sizes and timings. A transcription failing with a retryable
+    error is retried after a delay; if it still fails the file is marked
+    retryable so the caller can submit it again later. Returns that map
+    once every file is done. Any other exception, including one raised by
+    progress, stops the batch and is raised here.
+    """
+    files = {path: {"status": "queued"} for path in paths}
+    lock = threading.Lock()
+    finished = threading.Event()
+    slots = threading.Semaphore(max(1, transcribe_workers) + max(0, prefetch))
+    state = {"done": 0, "reported": 0.0}
+
+    if not paths:
+        return files
+
+    def update(path, **fields):
+        with lock:
+            files[path].update(fields)
+
+    def report(force=False):
+        with lock:
+            now = time.time()
+            if not progress or (not force and now - state["reported"] < INGEST_PROGRESS_INTERVAL):
+                return
+            state["reported"] = now
+            snapshot = {path: dict(info) for path, info in files.items()}
+            done = state["done"]
+        progress(done, len(paths), snapshot)
+
+    def complete(path, **fields):
+        update(path, **fields)
+        with lock:
+            state["done"] += 1
+            all_done = state["done"] == len(paths)
+        slots.release()
+        report(force=all_done)
+        if all_done:
+            finished.set()
+
+    def fail(e):
+        with lock:
+            state.setdefault("error", e)
+        # Wake the submit loop and the caller
+        slots.release(len(paths))
+        finished.set()
+
+    def guarded(fn):
+        def run(*args):
+            try:
+                fn(*args)
+            except Exception as e:
+                fail(e)
+        return run
+
+    def run_transcription(path, audio_bytes):
+        update(path, status="transcribing")
+        start = time.time()
+        for attempt in range(INGEST_TRANSCRIBE_RETRIES + 1):
+            try:
+                text = transcribe(audio_bytes)
+                break
+            except Exception as e:
+                retryable = bool(getattr(e, "retryable", False))
+                if not retryable or attempt == INGEST_TRANSCRIBE_RETRIES:
+                    complete(path, status="failed", error=f"Transcription error: {str(e)}", retryable=retryable)
+                    return
+                print(f"Transcription of {path} deferred ({e}), retrying")
+                update(path, status="waiting", error=str(e))
+                time.sleep(INGEST_RETRY_DELAY * 2 ** attempt)
+                update(path, status="transcribing")
+        if not text:
+            complete(path, status="failed", error="Transcription failed - no text was generated",
+                     transcribe_seconds=round(time.time() - start, 2))
+            return
+        with lock:
+            files[path].pop("error", None)
+        complete(path, status="completed", transcription=text, transcribe_seconds=round(time.time() - start, 2))
+
+    with ThreadPoolExecutor(max_workers=max(1, download_workers), thread_name_prefix="ingest-download") as downloads, \
+         ThreadPoolExecutor(max_workers=max(1, transcribe_workers), thread_name_prefix="ingest-transcribe") as transcriptions:
+
+        def fetch(path):
+            update(path, status="downloading")
+            start = time.time()
+            try:
+                audio_bytes = download_with_retry(bucket, path)
+            except Exception as e:
+                complete(path, status="failed", error=f"Download error: {str(e)}")
+                return
+            update(path, status="downloaded", bytes=len(audio_bytes),
+                   download_seconds=round(time.time() - start, 2))
+            transcriptions.submit(guarded(run_transcription), path, audio_bytes)
+
+        for path in paths:
+            # Blocks while enough files are already downloading or waiting
+            slots.acquire()
+            if "error" in state:
+                break
+            downloads.submit(guarded(fetch), path)
+        finished.wait()
+        if "error" in state:
+            downloads.shutdown(cancel_futures=True)
+            transcriptions.shutdown(cancel_futures=True)
+
+    if "error" in state:
+        raise state["error"]
+    return files
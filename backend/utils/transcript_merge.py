@@ -0,0 +1,100 @@
+import re
+
+# Upper bound on speech rate, used to limit how many repeated words an
+# overlap can account for
+WORDS_PER_SECOND = 4
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def _cut(left, right):
+    """Midpoint of the overlap between two consecutive segments, or None if they do not overlap."""
+    if right["start"] < left["end"]:
+        return (right["start"] + left["end"]) / 2
+    return None
+
+
+def _chunks_in_window(segment, low, high):
+    """Text of the timestamped chunks that end after low and start before high.
+
+    A chunk spanning a cut is kept by both neighbours, so nothing said across
+    the cut is lost; merge_segments drops the words repeated that way.
+    """
+    kept = []
+    for start, end, text in segment["chunks"]:
+        start = segment["start"] + (start or 0)
+        end = segment["end"] if end is None else segment["start"] + end
+        if (low is None or end > low) and (high is None or start < high):
+            kept.append(text.strip())
+    return " ".join(t for t in kept if t)
+
+
+def _last_chunk_crosses(segment, cut):
+    """True when the segment's last chunk starting before cut runs past it.
+
+    Only then can the segment's final word have been cut short at its edge.
+    """
+    for start, end, _ in reversed(segment.get("chunks") or []):
+        start = segment["start"] + (start or 0)
+        if start < cut:
+            end = segment["end"] if end is None else segment["start"] + end
+            return end > cut
+    return False
+
+
+def dedupe_boundary(previous, text, max_words, partial_last_word=False):
+    """Remove the longest start of text (up to max_words) that repeats the end of previous.
+
+    Words must match exactly. With partial_last_word, the last word of
+    previous may also have been cut short at the segment edge ("ov" for
+    "over"); it then matches the full word and is dropped from previous
+    instead. Returns the (previous, text) pair to use.
+    """
+    previous_words = previous.split()
+    tail = [_normalize(w) for w in previous_words[-max_words:]]
+    words = text.split()
+    head = [_normalize(w) for w in words[:max_words]]
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:-1] != head[:size - 1]:
+            continue
+        if tail[-1] == head[size - 1]:
+            return previous, " ".join(words[size:])
+        if partial_last_word and len(tail[-1]) > 1 and head[size - 1].startswith(tail[-1]):
+            return " ".join(previous_words[:-1]), " ".join(words[size - 1:])
+    return previous, text
+
+
+def merge_segments(segments):
+    """Join overlapping segment transcripts into one text.
+
+    segments are dicts with start and end (seconds in the full audio), text,
+    and chunks: Whisper's (start, end, text) timestamps relative to the
+    segment, or None. Each overlap is cut at its midpoint and a segment keeps
+    only the chunks on its side of the cut, so the copy of the overlap heard
+    near a segment's hard edge is discarded. Words then repeated across a
+    cut, by a chunk spanning it or by a segment without timestamps, are
+    dropped; a word cut short is only recognised where the timestamps show
+    its chunk crossing the cut. Segments that do not overlap are joined as
+    they are.
+    """
+    segments = sorted(segments, key=lambda s: s["start"])
+    pieces = []
+    for i, segment in enumerate(segments):
+        low = _cut(segments[i - 1], segment) if i > 0 else None
+        high = _cut(segment, segments[i + 1]) if i + 1 < len(segments) else None
+        text = (segment["text"] or "").strip()
+
+        if (low is not None or high is not None) and segment.get("chunks"):
+            text = _chunks_in_window(segment, low, high)
+        if low is not None and pieces:
+            overlap = segments[i - 1]["end"] - segment["start"]
+            pieces[-1], text = dedupe_boundary(
+                pieces[-1], text, int(overlap * WORDS_PER_SECOND) + 2,
+                partial_last_word=_last_chunk_crosses(segments[i - 1], low)
+            )
+
+        if text:
+            pieces.append(text)
+    return " ".join(p for p in pieces if p)
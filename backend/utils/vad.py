@@ -0,0 +1,113 @@
+import numpy as np
+
+FRAME_MS = 30
+
+# Absolute speech threshold (dBFS) for audio without quiet frames, where no
+# noise floor can be estimated
+ABSOLUTE_THRESHOLD_DB = -50
+
+
+def frame_energy_db(audio_data, sample_rate, frame_ms=FRAME_MS):
+    """RMS energy in dB for consecutive non-overlapping frames."""
+    frame_samples = max(1, int(sample_rate * frame_ms / 1000))
+    num_frames = int(np.ceil(len(audio_data) / frame_samples))
+    padded = np.zeros(num_frames * frame_samples, dtype=np.float32)
+    padded[:len(audio_data)] = audio_data
+    frames = padded.reshape(num_frames, frame_samples)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(rms + 1e-10), frame_samples
+
+
+def _runs(mask):
+    """Return (start, end) frame indices of consecutive True runs."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def detect_speech(audio_data, sample_rate, threshold_db=10, min_silence_ms=300, padding_ms=150):
+    """Return (start, end) sample offsets of speech regions.
+
+    A frame counts as speech when it is threshold_db above the estimated noise
+    floor (10th percentile of frame energy). When frame energies spread over
+    less than threshold_db there are no quiet frames to estimate the floor
+    from (a steady tone, noisy or heavily compressed audio), and frames above
+    ABSOLUTE_THRESHOLD_DB count as speech instead. Pauses shorter than min_silence_ms
+    are bridged and each region is padded so word edges are kept.
+    """
+    if len(audio_data) == 0:
+        return []
+
+    db, frame_samples = frame_energy_db(audio_data, sample_rate)
+    floor = np.percentile(db, 10)
+    if np.percentile(db, 90) - floor < threshold_db:
+        threshold = ABSOLUTE_THRESHOLD_DB
+    else:
+        threshold = max(floor + threshold_db, db.max() - 60)
+    speech = db > threshold
+
+    # Bridge short pauses between speech frames
+    starts, ends = _runs(~speech)
+    min_silence = max(1, int(min_silence_ms / FRAME_MS))
+    short = (ends - starts < min_silence) & (starts > 0) & (ends < len(speech))
+    fill = np.zeros(len(speech) + 1, dtype=np.int32)
+    np.add.at(fill, starts[short], 1)
+    np.add.at(fill, ends[short], -1)
+    speech |= np.cumsum(fill[:-1]) > 0
+
+    # Pad speech by dilating the mask
+    pad = int(padding_ms / FRAME_MS)
+    if pad:
+        speech = np.convolve(speech, np.ones(2 * pad + 1), mode='same') > 0
+
+    starts, ends = _runs(speech)
+    return [
+        (int(start * frame_samples), int(min(end * frame_samples, len(audio_data))))
+        for start, end in zip(starts, ends)
+    ]
+
+
+def vad_segments(audio_data, sample_rate, min_segment_length=5, max_segment_length=30,
+                 max_pause_length=1.0, **detect_kwargs):
+    """Split audio at pauses into segments of min..max seconds, dropping silence.
+
+    Consecutive speech regions are packed into one segment until adding the
+    next would exceed max_segment_length; pauses longer than max_pause_length
+    always end a segment and are not transcribed. Regions longer than the
+    maximum are hard-split. Returns (index, offset, length) in samples like
+    split_audio_offsets, so start/end times are offset / sample_rate.
+    """
+    min_samples = int(min_segment_length * sample_rate)
+    max_samples = int(max_segment_length * sample_rate)
+    max_pause = int(max_pause_length * sample_rate)
+
+    segments = []
+    current_start = current_end = None
+
+    def flush():
+        if current_start is not None:
+            segments.append((current_start, current_end - current_start))
+
+    for start, end in detect_speech(audio_data, sample_rate, **detect_kwargs):
+        if current_start is not None:
+            pause = start - current_end
+            too_long = end - current_start > max_samples
+            if pause > max_pause or (too_long and current_end - current_start >= min_samples):
+                flush()
+                current_start = None
+            elif too_long:
+                # Current segment is still short; take what fits and carry on
+                current_end = current_start + max_samples
+                flush()
+                start = max(start, current_end)
+                current_start = None
+
+        if current_start is None:
+            current_start = start
+        current_end = end
+
+        while current_end - current_start > max_samples:
+            segments.append((current_start, max_samples))
+            current_start += max_samples
+
+    flush()
+    return [(offset, offset, length) for offset, length in segments if length > 0]